@@ -0,0 +1,43 @@
+import os
+
+
+class AssetIndex:
+    """
+    Cached directory listings of the audio assets (music folders, their tracks and sfx files).
+
+    A directory is listed again only when its mtime changes. Sequence validation refreshes the index,
+    so playback reads track lists from memory and doesn't touch the SD card mid-show.
+    """
+
+    def __init__(self, track_filter):
+        self.track_filter = track_filter
+        self._dirs = {}  # directory -> (mtime_ns, frozenset of entry names, tuple of track paths)
+
+    def refresh(self, directory):
+        """Stat directory and list it again if its mtime changed. Returns False if it doesn't exist."""
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+            cached = self._dirs.get(directory)
+            if cached is not None and cached[0] == mtime_ns:
+                return True
+            names = os.listdir(directory)
+        except OSError:
+            self._dirs.pop(directory, None)
+            return False
+        tracks = tuple(os.path.join(directory, name) for name in sorted(names) if self.track_filter(name))
+        self._dirs[directory] = (mtime_ns, frozenset(names), tracks)
+        return True
+
+    def exists(self, asset_path):
+        """Whether asset_path is listed in its (refreshed) parent directory. An indexed directory is refreshed too."""
+        directory, name = os.path.split(asset_path.rstrip(os.sep))
+        exists = self.refresh(directory) and name in self._dirs[directory][1]
+        if asset_path in self._dirs:
+            self.refresh(asset_path)
+        return exists
+
+    def tracks(self, directory):
+        """Tracks of directory as of the last refresh. A directory that was never indexed is listed now."""
+        if directory not in self._dirs and not self.refresh(directory):
+            raise FileNotFoundError(f"Music folder {directory} does not exist")
+        return self._dirs[directory][2]
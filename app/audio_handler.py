@@ -1,4 +1,3 @@
-import os
 import random
 import vlc
 import time
@@ -10,6 +9,7 @@ import atexit
 
 from dunebugger_settings import settings
 from dunebugger_logging import logger
+from asset_index import AssetIndex
 
 
 class AudioPlayer:
@@ -19,6 +19,7 @@ class AudioPlayer:
         self.eastereggTriggered = False
         self.vlcdevice = settings.vlcdevice
         self.audio_available = True
+        self.asset_index = AssetIndex(self.checkaudioext)
 
         try:
             # Try to initialize VLC with ALSA audio output
@@ -70,6 +71,12 @@ class AudioPlayer:
     def get_sfx_filepath(self, sfx_file):
         return path.join(path.dirname(path.abspath(__file__)), "/opt/dunebugger-data/sfx", sfx_file)
 
+    def index_music_folder(self, music_folder):
+        """Index the tracks of music_folder (and of the easter egg folder), so playback doesn't list folders."""
+        self.asset_index.refresh(music_folder)
+        if settings.eastereggEnabled:
+            self.asset_index.refresh(self.get_music_path("easteregg"))
+
     def checkaudioext(self, filename):
         audioext = [
             "AAC",
@@ -106,9 +113,8 @@ class AudioPlayer:
         self.vplaysfx(sfx_file)
 
     def get_music_files(self, music_folder, max_files=20):
-        music_files = [os.path.join(music_folder, f) for f in os.listdir(music_folder)]  # get complete file paths
-        # Filter to keep only valid audio files
-        music_files = [f for f in music_files if self.checkaudioext(f)]
+        # Valid audio files with complete paths, as indexed at sequence validation time
+        music_files = list(self.asset_index.tracks(music_folder))
         logger.info(f"Added {str(len(music_files))} music files from folder {music_folder}")
 
         random.shuffle(music_files)  # shuffle list
@@ -119,9 +125,7 @@ class AudioPlayer:
         if settings.eastereggEnabled and self.eastereggTriggered:
             logger.info("EasterEgg enabled!!")
             easter_egg_folder = self.get_music_path("easteregg")
-            easter_egg_files = [os.path.join(easter_egg_folder, f) for f in os.listdir(easter_egg_folder)]  # get complete file paths
-            # Filter easter egg files to only include valid audio files
-            easter_egg_files = [f for f in easter_egg_files if self.checkaudioext(f)]
+            easter_egg_files = list(self.asset_index.tracks(easter_egg_folder))
             # Add easter egg files at the beginning of the music files list
             music_files = easter_egg_files + music_files
             self.eastereggTriggered = False
@@ -194,6 +198,21 @@ class AudioPlayer:
             logger.warning(f"vstopaudio exception: {e}")
             return
 
+    def pause_audio(self):
+        if not self.audio_available:
+            return
+        # set_pause only pauses a player that is playing, so a stopped player stays stopped on resume
+        self.musiclistplayer.set_pause(1)
+        self.sfxplayer.set_pause(1)
+        logger.info("Audio paused")
+
+    def resume_audio(self):
+        if not self.audio_available:
+            return
+        self.musiclistplayer.set_pause(0)
+        self.sfxplayer.set_pause(0)
+        logger.info("Audio resumed")
+
     def musicSetVolume(self, vol):
         if not self.audio_available or not self.musicplayer:
             logger.debug("Audio not available - skipping music volume set")
@@ -20,7 +20,7 @@ if settings.motorEnabled:
 else:
     motor_handler = None
 
-dmx_handler = DMXController(settings.dmxSerialPort, settings.dmxBaudRate)
+dmx_handler = DMXController(settings.dmxSerialPort, settings.dmxBaudRate, frame_rate=settings.dmxFrameRate, keepalive_secs=settings.dmxKeepaliveSecs, cue_cache_folder=settings.dmxCueCacheFolder, output=settings.dmxOutput, universes=settings.dmxUniverses, network_host=settings.dmxNetworkHost, first_universe=settings.dmxFirstUniverse)
 sequence_handler = SequencesHandler(mygpio_handler, GPIO, audio_handler, state_tracker, motor_handler, dmx_handler)
 command_interpreter = CommandInterpreter(mygpio_handler, sequence_handler)
 initialization_handler = InitializationHandler(command_interpreter)
@@ -0,0 +1,96 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+
+
+class MonotonicClock:
+    """Real time clock: waits and timers run on the running asyncio loop, blocking calls on an executor."""
+
+    def monotonic(self):
+        return time.monotonic()
+
+    async def wait(self, event, timeout=None):
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def call_later(self, delay, callback):
+        return asyncio.get_running_loop().call_later(delay, callback)
+
+    def run_blocking(self, executor, func, *args):
+        return asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+    def sleep(self, secs):
+        """Blocking sleep, for code running off the loop (e.g. in run_blocking)."""
+        time.sleep(secs)
+
+
+class VirtualTimer:
+    def __init__(self, when, callback):
+        self.when = when
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class VirtualClock:
+    """
+    Simulated clock for dry runs: a wait returns immediately after moving the virtual time forward,
+    and timers scheduled with call_later fire, in order, when the time they are due is crossed.
+    Everything, blocking calls included, runs on the caller's thread, so a run is deterministic.
+    """
+
+    def __init__(self, start=0.0):
+        self.now = start
+        self._timers = []
+        self._counter = itertools.count()
+        self._lock = threading.RLock()
+
+    def monotonic(self):
+        return self.now
+
+    async def wait(self, event, timeout=None):
+        if event.is_set():
+            return True
+        if timeout is None:
+            # Only another task can wake an unbounded wait (e.g. resume after a pause)
+            await event.wait()
+            return True
+        self.advance(timeout)
+        return event.is_set()
+
+    def call_later(self, delay, callback):
+        with self._lock:
+            timer = VirtualTimer(self.now + delay, callback)
+            heapq.heappush(self._timers, (timer.when, next(self._counter), timer))
+            return timer
+
+    def run_blocking(self, executor, func, *args):
+        future = asyncio.get_running_loop().create_future()
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def sleep(self, secs):
+        # Blocking calls run on the caller's thread: a sleep just moves the time forward, firing the timers due
+        self.advance(secs)
+
+    def advance(self, delta):
+        self.advance_to(self.now + delta)
+
+    def advance_to(self, target):
+        with self._lock:
+            while self._timers and self._timers[0][0] <= target:
+                when, _, timer = heapq.heappop(self._timers)
+                self.now = max(self.now, when)
+                if not timer.cancelled:
+                    timer.callback()
+            self.now = max(self.now, target)
@@ -4,6 +4,7 @@ from schedule import logger
 
 from dunebugger_settings import settings
 from dunebugger_logging import set_logger_level, get_logging_level_from_name, enable_queue_logging, disable_queue_logging
+from sequence_compiler import time_mark_to_seconds
 
 
 class CommandInterpreter:
@@ -86,10 +87,30 @@ class CommandInterpreter:
         #TODO: fix should not always print "Cycle started"
         return "Cycle started"
 
+    def handle_cycle_seek(self, args=None):
+        if not args:
+            raise ValueError("Usage: cseek <time> - where time is in seconds or [hh:]mm:ss")
+        if self.sequence_handler.get_cycle_state():
+            return "Cycle is already running"
+        start_offset = time_mark_to_seconds(args[0])
+        self.sequence_handler.cycle_seek(start_offset)
+        return f"Cycle started at {start_offset}s"
+
     def handle_cycle_stop(self, args=None):
-        self.sequence_handler.cycle_stop()
+        if not self.sequence_handler.cycle_stop():
+            return "No cycle running"
         return "Cycle stopped"
 
+    def handle_cycle_pause(self, args=None):
+        if not self.sequence_handler.cycle_pause():
+            return "No running cycle to pause"
+        return f"Cycle paused at {self.sequence_handler.get_elapsed_time():.1f}s"
+
+    def handle_cycle_resume(self, args=None):
+        if not self.sequence_handler.cycle_resume():
+            return "No paused cycle to resume"
+        return f"Cycle resumed at {self.sequence_handler.get_elapsed_time():.1f}s"
+
     def handle_set_logger_debug(self, args=None):
         set_logger_level("dunebuggerLog", get_logging_level_from_name("DEBUG"))
         return "Logger level set to DEBUG"
@@ -106,17 +127,18 @@ class CommandInterpreter:
         disable_queue_logging()
         return "Logger queue mode disabled"
 
-    def handle_set_standby_mode(self, args=None):
-        self.sequence_handler.setStandByMode()
+    async def handle_set_standby_mode(self, args=None):
+        await self.sequence_handler.setStandByMode()
         return "Standby mode state set"
 
-    def handle_set_off_mode(self, args=None):
-        self.sequence_handler.setOffMode()
+    async def handle_set_off_mode(self, args=None):
+        await self.sequence_handler.setOffMode()
         return "Off mode state set"
 
-    def handle_initialize_motor_limits(self, args=None):
+    async def handle_initialize_motor_limits(self, args=None):
         if settings.motorEnabled:
-            self.sequence_handler.motor_handler.initMotorLimits()
+            # initMotorLimits blocks until the limit switches are reached, and their events are dispatched on the loop
+            await asyncio.get_running_loop().run_in_executor(None, self.sequence_handler.motor_handler.initMotorLimits)
             return "Initializing motor limits"
         else:
             return "Motor module is disabled"
@@ -128,15 +150,23 @@ class CommandInterpreter:
             parsed_dmx_command_args = self.sequence_handler.dmx_handler.validate_dmx_command_args(args) 
             if isinstance(parsed_dmx_command_args, str):
                 return parsed_dmx_command_args
-            _, dmx_command, channel, scene_or_value, duration = parsed_dmx_command_args
+            _, dmx_command, channel, scene_or_value, duration, curve = parsed_dmx_command_args
 
-            self.sequence_handler.execute_dmx_command(dmx_command, channel, scene_or_value, duration)
+            self.sequence_handler.execute_dmx_command(dmx_command, channel, scene_or_value, duration, curve)
             
-            if dmx_command in ["fade", "fade_dimmer"]:
+            if dmx_command == "cue":
+                return f"DMX cue list {channel}: cue {scene_or_value}"
+            elif dmx_command in ["fade", "fade_dimmer"]:
                 return f"DMX command '{dmx_command}' started on channel {channel} with value '{scene_or_value}' over {duration}s"
             else:
                 return f"DMX command '{dmx_command}' executed on channel {channel} with value '{scene_or_value}'"
 
+    def handle_dmx_stats(self, args=None):
+        if not settings.dmxEnabled:
+            return "DMX module is disabled"
+        stats = self.sequence_handler.dmx_handler.get_transport_stats()
+        return f"DMX transport: {stats['frames_sent']} frames sent ({stats['bytes_sent']} bytes), {stats.get('frames_superseded', 0)} superseded, {stats['frames_dropped']} dropped"
+
     def handle_set_music_volume(self, volume=None):
         if volume is None:
             raise ValueError("Usage: mv <volume> - where volume is a number between 0-100, 'n' for normal volume, or 'q' for quiet volume")
@@ -178,6 +208,14 @@ class CommandInterpreter:
         self.sequence_handler.disable_start_button()
         return "Start button disabled"
 
+    def handle_start_button_stats(self, args=None):
+        stats = self.sequence_handler.get_trigger_stats()
+        return (
+            f"Start button: {stats['presses']} presses, {stats['admitted']} admitted, {stats['dropped']} dropped, {stats['bounces']} bounces, {stats['glitches']} glitches. "
+            f"Latency last {stats['last_latency'] * 1000:.1f}ms, max {stats['max_latency'] * 1000:.1f}ms, mean {stats['mean_latency'] * 1000:.1f}ms. "
+            f"Max queue wait {stats['max_queue_wait']:.1f}s"
+        )
+
     # async def handle_send_log(self, message):
     #     await self.mqueue_handler.dispatch_message(message, "log", "remote")
     #     return "Message sent"
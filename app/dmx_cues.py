@@ -0,0 +1,112 @@
+import hashlib
+import math
+import os
+
+import numpy as np
+from dunebugger_logging import logger
+
+
+def cue_index(name, cue_names, position, cue):
+    """
+    Index of cue in the cue list name: a cue index, a cue name, next or prev (relative to position,
+    the index of the last cue gone to, None if none yet: then next and prev are the first cue).
+    """
+    if isinstance(cue, int):
+        index = cue
+    elif cue == "next":
+        index = 0 if position is None else position + 1
+    elif cue == "prev":
+        index = 0 if position is None else position - 1
+    elif cue in cue_names:
+        index = cue_names.index(cue)
+    else:
+        raise ValueError(f"Cue '{cue}' not defined in cue list {name}")
+    if not 0 <= index < len(cue_names):
+        raise ValueError(f"No {cue} cue in cue list {name}")
+    return index
+
+
+class CueList:
+    """
+    Named looks, in order, each with the time of the crossfade into it. A look is one or more scenes
+    applied to their targets, on top of the look of the previous cue.
+
+    Every crossfade is pre-rendered at load, from the look of the previous cue (blackout for the first),
+    into a uint8 array with one row per frame of the render loop over the channels that change. The
+    arrays are saved in the cache folder and memory-mapped, so playing a crossfade is just copying a
+    row per tick. A cache file is named after a hash of its content, so a changed cue is rendered again.
+    A crossfade starts from the look of the previous cue, so it is only played when stepping forward;
+    going back or jumping goes straight to the look.
+    """
+
+    def __init__(self, name, cues, library, frame_rate, cache_folder):
+        self.name = name
+        self.cue_names = [cue_name for cue_name, _, _ in cues]
+        self.position = None  # index of the last cue gone to
+        self.crossfades = []  # per cue: (channel indices, frames)
+        self.looks = []  # per cue: (channel indices set by the cue list so far, their values)
+        self._render(cues, library, frame_rate, cache_folder)
+
+    def _render(self, cues, library, frame_rate, cache_folder):
+        os.makedirs(cache_folder, exist_ok=True)
+        previous = np.zeros(library.universe_size, dtype=np.uint8)
+        touched = np.zeros(library.universe_size, dtype=bool)
+        for index, (_, look, crossfade) in enumerate(cues):
+            current = previous.copy()
+            for scene, target in look:
+                channels, values = library.patch(scene, target)
+                current[channels] = values
+                touched[channels] = True
+            self.looks.append((np.flatnonzero(touched), current[touched]))
+            channels = np.flatnonzero(current != previous)
+            frame_count = max(1, math.ceil(crossfade * frame_rate))
+            key = hashlib.sha1(previous.tobytes() + current.tobytes() + str(frame_count).encode()).hexdigest()[:16]
+            cache_file = os.path.join(cache_folder, f"{self.name}-{index}-{key}.npy")
+            if not os.path.exists(cache_file):
+                progress = np.arange(1, frame_count + 1, dtype=np.float64)[:, np.newaxis] / frame_count
+                start = previous[channels].astype(np.float64)
+                frames = (start + (current[channels] - start) * progress).astype(np.uint8)
+                # Written aside and renamed, so that a cache file is always complete
+                with open(f"{cache_file}.tmp", "wb") as cache:
+                    np.save(cache, frames)
+                os.replace(f"{cache_file}.tmp", cache_file)
+            self.crossfades.append((channels, np.load(cache_file, mmap_mode="r")))
+            previous = current
+        logger.debug(f"DMX cue list {self.name}: {len(cues)} cues rendered")
+
+    def index(self, cue):
+        """Index of cue: a cue index, a cue name, next or prev (relative to the last cue gone to)."""
+        return cue_index(self.name, self.cue_names, self.position, cue)
+
+    def is_step(self, index):
+        """Whether index is the cue right after the last one gone to: the only one its crossfade starts from."""
+        return index == (0 if self.position is None else self.position + 1)
+
+    def reset(self):
+        self.position = None
+
+
+class CrossfadePlayback:
+    """A pre-rendered crossfade being played: the frame of a tick is the row of the time elapsed since start."""
+
+    def __init__(self, channels, frames, start_time, frame_rate):
+        self.channels = channels
+        self.frames = frames
+        self.start_time = start_time
+        self.frame_rate = frame_rate
+        self.active = np.ones(len(channels), dtype=bool)
+
+    def cancel(self, channels):
+        """Stop playing channels (e.g. set by a command)."""
+        self.active &= ~np.isin(self.channels, channels)
+
+    def finish(self, levels):
+        """Write the last frame of the channels still playing into levels, and stop."""
+        levels[self.channels[self.active]] = self.frames[-1][self.active]
+        self.active[:] = False
+
+    def render(self, now, levels):
+        """Write the frame of now into levels. Returns False once the last frame has been written."""
+        row = min(int((now - self.start_time) * self.frame_rate), len(self.frames) - 1)
+        levels[self.channels[self.active]] = self.frames[row][self.active]
+        return row < len(self.frames) - 1 and self.active.any()
@@ -0,0 +1,30 @@
+import numpy as np
+
+LUT_SIZE = 256
+
+# Fade easing curves, as functions of the linear progress 0.0-1.0
+EASING_FUNCTIONS = {
+    "linear": lambda t: t,
+    "ease_in": lambda t: t * t,
+    "ease_out": lambda t: 1 - (1 - t) * (1 - t),
+    "ease_in_out": lambda t: np.where(t < 0.5, 2 * t * t, 1 - 2 * (1 - t) * (1 - t)),
+    "s_curve": lambda t: t * t * t * (t * (6 * t - 15) + 10),
+}
+
+# Index of each curve in EASING_LUTS; linear is 0, and is evaluated exactly instead of looked up
+EASING_CURVES = list(EASING_FUNCTIONS)
+
+# EASING_LUTS[curve, i] is the eased progress at linear progress i / (LUT_SIZE - 1)
+EASING_LUTS = np.stack([EASING_FUNCTIONS[curve](np.linspace(0.0, 1.0, LUT_SIZE)) for curve in EASING_CURVES])
+
+
+def easing_index(curve):
+    if curve not in EASING_FUNCTIONS:
+        raise ValueError(f"Easing curve '{curve}' not defined")
+    return EASING_CURVES.index(curve)
+
+
+def gamma_lut(gamma):
+    """Output DMX value of each level 0-255 with gamma correction (gamma 1.0 is the identity)."""
+    levels = np.arange(LUT_SIZE) / (LUT_SIZE - 1)
+    return np.round(np.power(levels, gamma) * 255).astype(np.uint8)
@@ -0,0 +1,60 @@
+import numpy as np
+from dmx_curves import EASING_LUTS, LUT_SIZE
+
+
+class FadeEngine:
+    """
+    All the running DMX fades, as per-channel arrays over the universe: start value, target value,
+    start time, duration and easing curve, plus a mask of the channels that are fading.
+
+    A frame is rendered in one vectorized step over the whole universe, so its cost doesn't depend on
+    how many fixtures are fading. A new fade of a channel replaces the one running on it.
+    """
+
+    def __init__(self, universe_size):
+        self.start_values = np.zeros(universe_size, dtype=np.float64)
+        self.target_values = np.zeros(universe_size, dtype=np.float64)
+        self.start_times = np.zeros(universe_size, dtype=np.float64)
+        self.durations = np.zeros(universe_size, dtype=np.float64)
+        self.curves = np.zeros(universe_size, dtype=np.intp)  # index in EASING_LUTS, 0 is linear
+        self.active = np.zeros(universe_size, dtype=bool)
+
+    def start(self, channels, start_values, target_values, start_time, duration, curve=0):
+        """Fade channels (0-based indices, or a slice) from start_values to target_values, along easing curve."""
+        self.start_values[channels] = start_values
+        self.target_values[channels] = target_values
+        self.start_times[channels] = start_time
+        self.durations[channels] = duration
+        self.curves[channels] = curve
+        self.active[channels] = True
+
+    def cancel(self, channels):
+        self.active[channels] = False
+
+    def delay(self, secs, started_before):
+        """Push the fades started before started_before secs later, e.g. by the time they were paused."""
+        self.start_times[self.start_times < started_before] += secs
+
+    def is_fading(self):
+        return bool(self.active.any())
+
+    def render(self, now, universe):
+        """Write the values of the fading channels at time now into universe (a uint8 array). Returns True if any changed."""
+        if not self.active.any():
+            return False
+        elapsed = now - self.start_times
+        with np.errstate(divide="ignore", invalid="ignore"):
+            progress = np.where(self.durations > 0, elapsed / self.durations, 1.0)
+        np.clip(progress, 0.0, 1.0, out=progress)
+        # Eased curves are looked up, linear fades use the exact progress
+        eased = EASING_LUTS[self.curves, np.rint(progress * (LUT_SIZE - 1)).astype(np.intp)]
+        eased = np.where(self.curves == 0, progress, eased)
+        values = self.start_values + (self.target_values - self.start_values) * eased
+        values = np.clip(values, 0, 255).astype(np.uint8)
+        rendered = np.where(self.active, values, universe)
+        changed = not np.array_equal(rendered, universe)
+        if changed:
+            universe[:] = rendered
+        # Finished fades have just been rendered at their target
+        self.active &= progress < 1.0
+        return changed
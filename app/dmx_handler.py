@@ -1,14 +1,22 @@
 # dmx_handler.py
 """
-DMX controller for ENTTEC DMX USB Pro (for Raspberry Pi)
+DMX controller for ENTTEC DMX USB Pro, Art-Net or sACN (for Raspberry Pi)
 
 Features:
 - set_rgb(channel, r, g, b): Set RGB values for a PAR starting at channel
 - fade_to_rgb(channel, r, g, b, duration): Fade RGB to target over duration (seconds)
-- set_dimmer(channel, intensity): Set dimmer intensity (0.0-1.0) while maintaining color ratios
-- fade_to_dimmer(channel, intensity, duration): Fade to dimmer intensity over time
-- set_scene(scene_name): Set predefined scenes
-- Non-blocking fades using threading
+- set_dimmer(target, intensity): Set dimmer intensity (0.0-1.0) while maintaining color ratios
+- fade_to_dimmer(target, intensity, duration): Fade to dimmer intensity over time
+- set_scene(scene_name, target) / fade_to_scene(scene_name, target, duration): Apply a scene
+  of the library. Fixture profiles, fixtures, groups and scenes are configured in config/dmx.conf
+  (see dmx_scenes.py); a target is a start channel, a fixture or a group
+- go_cue(cue, cue_list): Go to a cue of a cue list, with its pre-rendered crossfade (see dmx_cues.py)
+- batch(): Group several commands into a single DMX frame
+- Non-blocking fades: a render thread sends one frame per tick, at a fixed frame rate,
+  with all the running fades evaluated for that tick in one vectorized step (see dmx_fades.py)
+- Pluggable output (see dmx_outputs.py): ENTTEC DMX USB Pro (one universe), Art-Net or sACN
+  over UDP (several universes). Channels are numbered across the universes: channel 513 is the
+  first of the second universe. A universe is sent only when it changed (or for keepalive)
 
 Example usage:
     dmx = DMXController('/dev/ttyUSB0')
@@ -18,249 +26,396 @@ Example usage:
     dmx.set_dimmer(1, 0.5)  # 50% brightness
     dmx.fade_to_dimmer(1, 0.8, 3.0)  # Fade to 80% over 3 seconds
     dmx.set_scene('warm_white')
+    dmx.fade_to_scene('blue', 'pars', 5.0)  # Every fixture of the group
 """
 import time
+import tempfile
 import threading
-import serial
+from os import path
+from contextlib import contextmanager
+import numpy as np
 from dunebugger_logging import logger
-
-SCENES = {
-    'warm_white': (255, 180, 80),
-    'cool_white': (180, 220, 255),
-    'red': (255, 0, 0),
-    'green': (0, 255, 0),
-    'blue': (0, 0, 255),
-}
+from dmx_fades import FadeEngine
+from dmx_scenes import SceneLibrary, COLOR_FUNCTIONS
+from dmx_curves import EASING_CURVES, easing_index, gamma_lut
+from dmx_cues import CueList, CrossfadePlayback
+from dmx_outputs import UNIVERSE_SIZE, create_output
 
 class DMXController:
-    def __init__(self, port, baudrate=57600, universe_size=512):
-        self.port = port
-        self.baudrate = baudrate
-        self.universe = bytearray([0] * universe_size)
-        self.serial_conn = None
-        self._fade_tasks = {}
-        self._lock = threading.Lock()
+    def __init__(self, port, baudrate=57600, universes=1, frame_rate=40, keepalive_secs=1.0, library=None, cue_cache_folder=None, output="enttec", network_host=None, first_universe=None):
+        # The output owns a packet per universe, built once, with the universe data as a view on it
+        self.output = create_output(output, port, baudrate, universes, network_host, first_universe)
+        channel_count = universes * UNIVERSE_SIZE
+        # Commands and fades work on levels; the universes are the levels through the gamma LUT of each channel
+        self._levels = np.zeros(channel_count, dtype=np.uint8)
+        self._output_levels = np.zeros(channel_count, dtype=np.uint8)
+        self._dirty = True
+        self._last_sent = [float("-inf")] * len(self.output.universes)
+        self.frame_rate = frame_rate
+        self.keepalive_secs = keepalive_secs
+        self._fades = FadeEngine(channel_count)
+        self.library = library or SceneLibrary(universe_size=channel_count)
+        self._load_gamma_luts()
+        self.cue_lists = {}
+        self._crossfade = None  # CrossfadePlayback of the last cue gone to, while it runs
+        self._paused_at = None  # while paused, fades and crossfades hold their current frame
+        self._load_cue_lists(cue_cache_folder or path.join(tempfile.gettempdir(), "dunebugger-dmx-cues"))
+        self._lock = threading.RLock()
+        self._render_thread = None
+        self._render_stop = threading.Event()
         self.connect()
 
     def connect(self):
         try:
-            self.serial_conn = serial.Serial(self.port, self.baudrate, timeout=1)
-            reply_message = self._send_dmx()
-            if reply_message is not None:
-                logger.error(f"DMX connection error: {reply_message}")
-            else:
-                logger.info(f"DMX connected to {self.port}")
+            self.output.open()
+            self._send_dmx(time.monotonic())
+            logger.info(f"DMX connected to {self.output.describe()}")
+            self._start_render_loop()
         except Exception as e:
             logger.error(f"Failed to connect DMX: {e}")
 
+    def is_connected(self):
+        return self.output.is_connected()
+
+    async def start_transport(self):
+        """Start the asyncio side of the output, if it has one (the ENTTEC serial writer)."""
+        await self.output.start()
+
+    async def stop_transport(self):
+        # The output can't send anymore once stopped: stop rendering first
+        self._stop_render_loop()
+        was_connected = self.is_connected()
+        await self.output.stop()
+        if was_connected and not self.is_connected():
+            logger.info("DMX disconnected")
+
+    def get_transport_stats(self):
+        return self.output.get_stats()
+
+    def _start_render_loop(self):
+        self._render_stop.clear()
+        self._render_thread = threading.Thread(target=self._render_loop, name="dmx_render", daemon=True)
+        self._render_thread.start()
+
+    def _render_loop(self):
+        """
+        Tick at frame_rate and evaluate every running fade for that tick. A universe is sent only if it
+        changed, or if it wasn't sent for keepalive_secs, so static lights cost no serial or network traffic.
+        """
+        period = 1.0 / self.frame_rate
+        next_tick = time.monotonic()
+        while not self._render_stop.is_set():
+            try:
+                with self._lock:
+                    now = time.monotonic()
+                    if self._paused_at is None:
+                        self._render_fades(now)
+                    self._send_dmx(now)
+            except Exception as e:
+                logger.error(f"DMX render error: {e}")
+            next_tick += period
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                # Late (e.g. a slow serial write): skip the missed ticks instead of bursting frames
+                next_tick = time.monotonic()
+                delay = 0
+            self._render_stop.wait(delay)
+
+    def _load_gamma_luts(self):
+        gammas = self.library.channel_gammas()
+        unique_gammas, self._channel_luts = np.unique(gammas, return_inverse=True)
+        self._gamma_luts = np.stack([gamma_lut(gamma) for gamma in unique_gammas])
+
+    def _load_cue_lists(self, cache_folder):
+        for name, cues in self.library.cue_lists.items():
+            try:
+                self.cue_lists[name] = CueList(name, cues, self.library, self.frame_rate, cache_folder)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error rendering DMX cue list {name}: {e}")
+
+    def _render_fades(self, now):
+        if self._fades.render(now, self._levels):
+            self._dirty = True
+        if self._crossfade is not None:
+            if not self._crossfade.render(now, self._levels):
+                self._crossfade = None
+            self._dirty = True
+
+    def pause(self):
+        """Hold the running fades and crossfade where they are. Levels set meanwhile still go out."""
+        with self._lock:
+            if self._paused_at is None:
+                self._paused_at = time.monotonic()
+
+    def resume(self):
+        """Continue the fades and crossfade held by pause from where they were."""
+        with self._lock:
+            if self._paused_at is None:
+                return
+            paused_secs = time.monotonic() - self._paused_at
+            # Fades and crossfades started while paused didn't lose any time
+            self._fades.delay(paused_secs, self._paused_at)
+            if self._crossfade is not None and self._crossfade.start_time < self._paused_at:
+                self._crossfade.start_time += paused_secs
+            self._paused_at = None
+
+    def _cancel(self, channels):
+        # A command on a channel stops whatever fade or crossfade is running on it
+        self._fades.cancel(channels)
+        if self._crossfade is not None:
+            if isinstance(channels, slice):
+                channels = np.arange(len(self._levels))[channels]
+            self._crossfade.cancel(channels)
+
+    def _render_frame(self):
+        self._output_levels[:] = self._gamma_luts[self._channel_luts, self._levels]
+
+    def _start_fade(self, channels, start_values, target_values, duration, curve="linear"):
+        # A new fade (or set) of a channel replaces the one running on it
+        with self._lock:
+            self._cancel(channels)
+            self._fades.start(channels, start_values, target_values, time.monotonic(), duration, easing_index(curve))
+
     def set_rgb(self, start_channel, r, g, b):
         with self._lock:
-            self.universe[start_channel-1:start_channel+2] = bytes([r, g, b])
-            self._send_dmx()
-
-    def fade_to_rgb(self, start_channel, r, g, b, duration):
-        # Stop any existing fade for this channel
-        fade_key = f"fade_{start_channel}"
-        if fade_key in self._fade_tasks:
-            self._fade_tasks[fade_key] = False  # Signal to stop
-        
-        # Start new fade in background thread
-        self._fade_tasks[fade_key] = True
-        fade_thread = threading.Thread(
-            target=self._fade_worker, 
-            args=(start_channel, r, g, b, duration, fade_key),
-            daemon=True
-        )
-        fade_thread.start()
-
-    def _fade_worker(self, start_channel, r, g, b, duration, fade_key):
-        try:
-            with self._lock:
-                current = list(self.universe[start_channel-1:start_channel+2])
-            target = [r, g, b]
-            steps = int(duration * 30)
-            
-            for i in range(1, steps+1):
-                if not self._fade_tasks.get(fade_key, False):  # Check if cancelled
-                    break
-                    
-                intermediate = [
-                    int(current[j] + (target[j] - current[j]) * i / steps)
-                    for j in range(3)
-                ]
-                with self._lock:
-                    self.universe[start_channel-1:start_channel+2] = bytes(intermediate)
-                    self._send_dmx()
-                time.sleep(duration / steps)
-            
-            # Clean up
-            if fade_key in self._fade_tasks:
-                del self._fade_tasks[fade_key]
-        except Exception as e:
-            logger.error(f"DMX fade error: {e}")
+            self._cancel(slice(start_channel-1, start_channel+2))
+            self._levels[start_channel-1:start_channel+2] = [r, g, b]
+            self._dirty = True
 
-    def fade_to_scene(self, scene_name, start_channel=1, duration=2.0):
-        rgb = SCENES.get(scene_name)
-        if rgb:
-            self.fade_to_rgb(start_channel, *rgb, duration)
-        else:
-            raise ValueError(f"Scene '{scene_name}' not defined")
+    def fade_to_rgb(self, start_channel, r, g, b, duration, curve="linear"):
+        with self._lock:
+            current = self._levels[start_channel-1:start_channel+2]
+            self._start_fade(slice(start_channel-1, start_channel+2), current, [r, g, b], duration, curve)
 
-    def set_scene(self, scene_name, start_channel=1):
-        rgb = SCENES.get(scene_name)
-        if rgb:
-            self.set_rgb(start_channel, *rgb)
-        else:
-            raise ValueError(f"Scene '{scene_name}' not defined")
-        
-    def set_dimmer(self, intensity, start_channel):
+    def fade_to_scene(self, scene_name, target=1, duration=2.0, curve="linear"):
+        """Fade target (start channel, fixture or group) to a scene of the library, along an easing curve."""
+        channels, values = self.library.patch(scene_name, target)
+        with self._lock:
+            self._start_fade(channels, self._levels[channels], values, duration, curve)
+
+    def set_scene(self, scene_name, target=1):
+        """Set target (start channel, fixture or group) to a scene of the library."""
+        channels, values = self.library.patch(scene_name, target)
+        with self._lock:
+            self._cancel(channels)
+            self._levels[channels] = values
+            self._dirty = True
+
+    def get_cue_list(self, cue_list=None):
+        """A cue list by name, or the first one configured."""
+        if cue_list is None:
+            if not self.cue_lists:
+                raise ValueError("No DMX cue list defined")
+            return next(iter(self.cue_lists.values()))
+        if cue_list not in self.cue_lists:
+            raise ValueError(f"DMX cue list '{cue_list}' not defined")
+        return self.cue_lists[cue_list]
+
+    def reset_cue_lists(self):
+        """Forget the last cue gone to of every cue list: the next cue is the first one again."""
+        with self._lock:
+            for cues in self.cue_lists.values():
+                cues.reset()
+
+    def go_cue(self, cue, cue_list=None, crossfade=True):
+        """
+        Go to a cue (a cue index, a cue name, next or prev) of a cue list, playing its pre-rendered
+        crossfade, or straight to its look if crossfade is False. The crossfade starts from the look of
+        the previous cue of the list, so going back or jumping ahead goes straight to the look too.
+        """
+        cues = self.get_cue_list(cue_list)
+        with self._lock:
+            index = cues.index(cue)
+            if crossfade and cues.is_step(index):
+                channels, frames = cues.crossfades[index]
+                if self._crossfade is not None:
+                    # The next crossfade starts from the look this one ends on, and only covers the
+                    # channels that change from there: the others must be at that look already
+                    self._crossfade.finish(self._levels)
+                self._cancel(channels)
+                self._crossfade = CrossfadePlayback(channels, frames, time.monotonic(), self.frame_rate)
+            else:
+                channels, values = cues.looks[index]
+                self._cancel(channels)
+                self._levels[channels] = values
+            cues.position = index
+            self._dirty = True
+        logger.debug(f"DMX cue list {cues.name}: cue {cues.cue_names[index]}")
+
+    def _dimmer_channels(self, target):
+        """Per fixture of target: the channels its dimmer commands drive, and whether that is a dimmer channel (else color channels)."""
+        for profile, start_channel in self.library.resolve(target):
+            has_dimmer = "dimmer" in profile
+            functions = ("dimmer",) if has_dimmer else COLOR_FUNCTIONS
+            channels = [start_channel - 1 + offset for offset, function in enumerate(profile) if function in functions]
+            channels = np.array([channel for channel in channels if channel < len(self._levels)], dtype=np.intp)
+            if len(channels):
+                yield channels, has_dimmer
+
+    def set_dimmer(self, intensity, target):
         """
-        Set the dimmer intensity for RGB channels while maintaining color ratios.
+        Set the dimmer intensity of target while maintaining color ratios: a fixture with a dimmer channel
+        gets it set, the color channels of the others are scaled.
         
         Args:
-            start_channel (int): Starting DMX channel (1-based)
+            target (int or str): Starting DMX channel (1-based), fixture or group
             intensity (float): Intensity level from 0.0 (off) to 1.0 (full brightness)
         """
         intensity = max(0.0, min(1.0, intensity))  # Clamp between 0 and 1
         
         with self._lock:
-            current_rgb = list(self.universe[start_channel-1:start_channel+2])
-            # Apply intensity scaling to current RGB values
-            dimmed_rgb = [int(value * intensity) for value in current_rgb]
-            self.universe[start_channel-1:start_channel+2] = bytes(dimmed_rgb)
-            self._send_dmx()
+            for channels, has_dimmer in self._dimmer_channels(target):
+                self._cancel(channels)
+                if has_dimmer:
+                    self._levels[channels] = int(intensity * 255)
+                else:
+                    # Apply intensity scaling to current color values
+                    self._levels[channels] = (self._levels[channels] * intensity).astype(np.uint8)
+            self._dirty = True
 
-    def fade_to_dimmer(self, intensity, start_channel, duration):
+    def fade_to_dimmer(self, intensity, target, duration, curve="linear"):
         """
         Fade to a specific dimmer intensity over time.
         
         Args:
-            start_channel (int): Starting DMX channel (1-based)
+            target (int or str): Starting DMX channel (1-based), fixture or group
             intensity (float): Target intensity level from 0.0 to 1.0
             duration (float): Fade duration in seconds
+            curve (str): Easing curve of the fade (see dmx_curves.py)
         """
-        intensity = max(0.0, min(1.0, intensity))  # Clamp between 0 and 1
-        
-        # Stop any existing fade for this channel
-        fade_key = f"dimmer_fade_{start_channel}"
-        if fade_key in self._fade_tasks:
-            self._fade_tasks[fade_key] = False  # Signal to stop
-        
-        # Start new dimmer fade in background thread
-        self._fade_tasks[fade_key] = True
-        fade_thread = threading.Thread(
-            target=self._dimmer_fade_worker, 
-            args=(start_channel, intensity, duration, fade_key),
-            daemon=True
-        )
-        fade_thread.start()
-
-    def _dimmer_fade_worker(self, start_channel, target_intensity, duration, fade_key):
-        """Worker thread for dimmer fading."""
+        target_intensity = max(0.0, min(1.0, intensity))  # Clamp between 0 and 1
+
         with self._lock:
-            current_rgb = list(self.universe[start_channel-1:start_channel+2])
-        
-        # Calculate current intensity (max of RGB values normalized to 0-1)
-        max_current = max(current_rgb) if max(current_rgb) > 0 else 1
-        current_intensity = max_current / 255.0
-        
-        # Store the original color ratios
-        if max_current > 0:
-            color_ratios = [value / max_current for value in current_rgb]
-        else:
-            color_ratios = [1.0, 1.0, 1.0]  # Default to white if all zeros
-        
-        steps = int(duration * 30)  # 30 FPS
-        
-        for i in range(1, steps+1):
-            if not self._fade_tasks.get(fade_key, False):  # Check if cancelled
-                break
-                
-            # Interpolate intensity
-            intermediate_intensity = current_intensity + (target_intensity - current_intensity) * i / steps
-            
-            # Apply intensity to color ratios
-            intermediate_rgb = [
-                int(ratio * intermediate_intensity * 255)
-                for ratio in color_ratios
-            ]
-            
-            with self._lock:
-                self.universe[start_channel-1:start_channel+2] = bytes(intermediate_rgb)
-                self._send_dmx()
-            time.sleep(duration / steps)
-        
-        # Clean up
-        if fade_key in self._fade_tasks:
-            del self._fade_tasks[fade_key]
-
-    def _send_dmx(self):
-        # ENTTEC DMX USB Pro: send DMX packet (see protocol)
-        # Start code: 0x7E, Label: 6, Length: 513, Data: [0]+universe, End: 0xE7
-        data = bytes([0x7E, 6, 0x02, 0x02, 0x00]) + bytes([0]) + self.universe + bytes([0xE7])
-        self.serial_conn.write(data)
-        self.serial_conn.flush()
-            
+            for channels, has_dimmer in self._dimmer_channels(target):
+                current = self._levels[channels].astype(np.float64)
+                if has_dimmer:
+                    self._start_fade(channels, current, np.full(len(channels), target_intensity * 255), duration, curve)
+                    continue
+
+                # Calculate current intensity (max of color values normalized to 0-1)
+                max_current = current.max() if current.max() > 0 else 1
+                current_intensity = max_current / 255.0
+
+                # Store the original color ratios
+                if current.max() > 0:
+                    color_ratios = current / max_current
+                else:
+                    color_ratios = np.ones(len(channels))  # Default to white if all zeros
+
+                # Interpolating the intensity keeps the color ratios
+                self._start_fade(channels, color_ratios * current_intensity * 255, color_ratios * target_intensity * 255, duration, curve)
+
+    @contextmanager
+    def batch(self):
+        """Apply several commands to the universe so that they go out in the same DMX frame."""
+        with self._lock:
+            yield self
+
+    def _send_dmx(self, now):
+        # Called with the lock held (or before the render loop starts), so a universe can't change mid-write
+        if self._dirty:
+            self._render_frame()
+            self._dirty = False
+        for index, universe in enumerate(self.output.universes):
+            levels = self._output_levels[index * UNIVERSE_SIZE:(index + 1) * UNIVERSE_SIZE]
+            if np.array_equal(universe, levels) and now - self._last_sent[index] < self.keepalive_secs:
+                continue
+            universe[:] = levels
+            self.output.send(index)
+            self._last_sent[index] = now
+
+
+    def _stop_render_loop(self):
+        if self._render_thread is not None:
+            self._render_stop.set()
+            if self._render_thread is not threading.current_thread():
+                self._render_thread.join(timeout=1)
+            self._render_thread = None
+
     def disconnect(self):
-        if self.serial_conn:
-            self.serial_conn.close()
-            self.serial_conn = None
+        self._stop_render_loop()
+        if self.is_connected():
+            self.output.close()
             logger.info("DMX disconnected")
     
     def __del__(self):
         self.disconnect()
 
+    def parse_dmx_target(self, target):
+        """A start channel (int) for a number, else a fixture or group name. None if invalid."""
+        if target.isdigit():
+            target = int(target)
+        return target if self.library.is_target(target) else None
+
+    def validate_dmx_cue_args(self, args):
+        """Cue commands parse to (None, "cue", cue list, cue, None, None), with cue a cue name, next or prev."""
+        usage = "Usage: dmx cue <next|prev> [cue list] or dmx cue goto <cue> [cue list]"
+        if not args or args[0] not in ("next", "prev", "goto"):
+            return f"Missing or invalid cue action. {usage}"
+        if args[0] == "goto":
+            if len(args) < 2:
+                return f"Missing cue. {usage}"
+            cue, cue_list = args[1], args[2] if len(args) > 2 else None
+        else:
+            cue, cue_list = args[0], args[1] if len(args) > 1 else None
+        try:
+            cues = self.get_cue_list(cue_list)
+        except ValueError as e:
+            return f"{e}. Cue lists: {', '.join(self.cue_lists)}"
+        if cue not in ("next", "prev") and cue not in cues.cue_names:
+            return f"Invalid cue: {cue}. Cues of {cues.name}: {', '.join(cues.cue_names)}"
+        return (None, "cue", cues.name, cue, None, None)
+
     def validate_dmx_command_args(self, args):
+        scenes = ", ".join(self.library.scene_names())
         if not args or len(args) == 0:
-            return ("Usage: dmx <command> <channel> <scene_or_value> [duration]\n"
+            return ("Usage: dmx <command> <target> <scene_or_value> [duration] [curve]\n"
+                f"Target: a start channel 1-{len(self._levels)}, a fixture or a group of dmx.conf\n"
                 "Commands:\n"
-                "  set <channel> <scene>\n"
-                "  fade <channel> <scene> [duration]\n"
-                "  dimmer <channel> <value 0.0-1.0>\n"
-                "  fade_dimmer <channel> <value 0.0-1.0> [duration]\n"
-                "Scenes: warm_white, cool_white, red, green, blue")
+                "  set <target> <scene>\n"
+                "  fade <target> <scene> [duration] [curve]\n"
+                "  dimmer <target> <value 0.0-1.0>\n"
+                "  fade_dimmer <target> <value 0.0-1.0> [duration] [curve]\n"
+                "  cue <next|prev> [cue list]\n"
+                "  cue goto <cue> [cue list]\n"
+                f"Scenes: {scenes}\n"
+                f"Curves: {', '.join(EASING_CURVES)}")
         
         dmx_command = args[0].lower()
-        valid_commands = {"set", "fade", "dimmer", "fade_dimmer"}
+        valid_commands = {"set", "fade", "dimmer", "fade_dimmer", "cue"}
         if dmx_command not in valid_commands:
-            return (f"Invalid DMX command: {dmx_command}. Valid commands: set, fade, dimmer, fade_dimmer.\n"
-                "Usage: dmx <command> <channel> <scene_or_value> [duration]")
+            return (f"Invalid DMX command: {dmx_command}. Valid commands: set, fade, dimmer, fade_dimmer, cue.\n"
+                "Usage: dmx <command> <target> <scene_or_value> [duration]")
+        if dmx_command == "cue":
+            return self.validate_dmx_cue_args(args[1:])
         
         # Command present but missing further arguments
         if len(args) == 1:
             if dmx_command in ("set", "fade"):
-                return f"Missing arguments. Usage: dmx {dmx_command} <channel> <scene>{' [duration]' if dmx_command == 'fade' else ''}. Scenes: warm_white, cool_white, red, green, blue"
+                return f"Missing arguments. Usage: dmx {dmx_command} <target> <scene>{' [duration] [curve]' if dmx_command == 'fade' else ''}. Scenes: {scenes}"
             elif dmx_command == "dimmer":
-                return "Missing arguments. Usage: dmx dimmer <channel> <value 0.0-1.0>"
+                return "Missing arguments. Usage: dmx dimmer <target> <value 0.0-1.0>"
             elif dmx_command == "fade_dimmer":
-                return "Missing arguments. Usage: dmx fade_dimmer <channel> <value 0.0-1.0> [duration]"
+                return "Missing arguments. Usage: dmx fade_dimmer <target> <value 0.0-1.0> [duration] [curve]"
         
+        # Validate target: args[1] must be a start channel of the universes, a fixture or a group
+        channel = self.parse_dmx_target(args[1])
+        if channel is None:
+            return f"Invalid DMX target: {args[1]}. Must be a channel between 1 and {len(self._levels)}, a fixture or a group"
+
         if len(args) == 2:
-            channel = args[1]
-            if not channel.isdigit() or not (1 <= int(channel) <= 512):
-                return f"Invalid or missing channel: {channel}. Channel must be an integer 1-512."
             if dmx_command in ("set", "fade"):
-                return f"Missing scene. Usage: dmx {dmx_command} {channel} <scene>{' [duration]' if dmx_command == 'fade' else ''}. Scenes: warm_white, cool_white, red, green, blue"
+                return f"Missing scene. Usage: dmx {dmx_command} {channel} <scene>{' [duration] [curve]' if dmx_command == 'fade' else ''}. Scenes: {scenes}"
             elif dmx_command == "dimmer":
                 return f"Missing dimmer value. Usage: dmx dimmer {channel} <value 0.0-1.0>"
             elif dmx_command == "fade_dimmer":
-                return f"Missing dimmer value. Usage: dmx fade_dimmer {channel} <value 0.0-1.0> [duration]"
-            
-        if len(args) == 3 and dmx_command in ("fade", "fade_dimmer"):
-            # Third arg present; duration optional, handled later (defaults)
-            pass
-
-        # Validate channel: args[1] must be an integer between 1 and 512
-        channel = args[1]
-        if not channel.isdigit() or not (1 <= int(channel) <= 512):
-            return f"Invalid DMX channel: {channel}. Must be an integer between 1 and 512"
-        channel = int(channel)
+                return f"Missing dimmer value. Usage: dmx fade_dimmer {channel} <value 0.0-1.0> [duration] [curve]"
 
         # Validate scene_or_value: args[2] must be a valid scene name or a float between 0.0 and 1.0
         scene_or_value = args[2]
         if dmx_command in ["set", "fade"]:
-            if scene_or_value not in ["warm_white", "cool_white", "red", "green", "blue"]:
-                return f"Invalid DMX scene: {scene_or_value}. Must be one of 'warm_white', 'cool_white', 'red', 'green', 'blue'"
+            if scene_or_value not in self.library.scenes:
+                return f"Invalid DMX scene: {scene_or_value}. Must be one of {scenes}"
         elif dmx_command in ["dimmer", "fade_dimmer"]:
             try:
                 scene_or_value = float(scene_or_value)
@@ -271,10 +426,17 @@ class DMXController:
         
         # Validate duration for fade commands
         duration = 2.0  # Default duration
-        if len(args) == 4 and dmx_command in ["fade", "fade_dimmer"]:
+        if len(args) >= 4 and dmx_command in ["fade", "fade_dimmer"]:
             duration = args[3]
             if not duration.replace('.', '', 1).isdigit() and float(duration) < 0:
                 return f"Invalid duration value: {duration}. Must be a positive number"
             duration = float(duration)
+
+        # Validate the easing curve of fade commands
+        curve = "linear"  # Default curve
+        if len(args) >= 5 and dmx_command in ["fade", "fade_dimmer"]:
+            curve = args[4].lower()
+            if curve not in EASING_CURVES:
+                return f"Invalid easing curve: {curve}. Must be one of {', '.join(EASING_CURVES)}"
         
-        return (None, dmx_command, channel, scene_or_value, duration)
\ No newline at end of file
+        return (None, dmx_command, channel, scene_or_value, duration, curve)
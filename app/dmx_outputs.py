@@ -0,0 +1,213 @@
+import socket
+import struct
+import uuid
+
+import numpy as np
+import serial
+from dunebugger_logging import logger
+from dmx_transport import DMXSerialTransport
+
+UNIVERSE_SIZE = 512
+
+ARTNET_PORT = 6454
+SACN_PORT = 5568
+
+
+class EnttecUsbProOutput:
+    """
+    ENTTEC DMX USB Pro: a single universe over USB serial.
+
+    The "send DMX packet" message is built once: start of message 0x7E, label 6, data length (LSB, MSB),
+    DMX start code 0, the universe, end of message 0xE7. The universe is a view on it, so sending doesn't
+    copy anything. Once the async serial transport is started, frames are posted to it instead of written,
+    and the port belongs to it: once the transport is stopped or the connection is lost, frames are dropped.
+    """
+
+    def __init__(self, port, baudrate, universes=1, universe_size=UNIVERSE_SIZE):
+        self.port = port
+        self.baudrate = baudrate
+        if universes > 1:
+            logger.warning(f"ENTTEC DMX USB Pro outputs a single universe: universes 2-{universes} are not sent")
+        length = universe_size + 2
+        self._frame = bytearray([0x7E, 6, length & 0xFF, length >> 8, 0x00, 0]) + bytearray(universe_size) + bytearray([0xE7])
+        self.universes = [np.frombuffer(self._frame, dtype=np.uint8, count=universe_size, offset=6)]
+        self.serial_conn = None
+        self._transport = DMXSerialTransport()
+        self._handed_over = False  # whether the port was handed over to the transport
+        self.stats = {"frames_sent": 0, "bytes_sent": 0, "frames_dropped": 0}
+
+    def describe(self):
+        return self.port
+
+    def open(self):
+        self.serial_conn = serial.Serial(self.port, self.baudrate, timeout=1)
+
+    def is_connected(self):
+        if self._handed_over:
+            return self._transport.is_running()
+        return self.serial_conn is not None
+
+    async def start(self):
+        """Hand the serial port over to the asyncio writer: from now on frames are posted, never written by the caller."""
+        if self.serial_conn is None or self._transport.is_running():
+            return
+        try:
+            await self._transport.start(self.serial_conn)
+            self._handed_over = True
+            logger.info("DMX async serial transport started")
+        except Exception as e:
+            logger.error(f"Failed to start DMX async serial transport, frames are written directly: {e}")
+
+    async def stop(self):
+        if not self._handed_over:
+            return
+        # Also after a lost connection: the writer task is still there
+        await self._transport.stop()
+        # Closing the transport closed the serial port too
+        self.serial_conn = None
+        self._handed_over = False
+
+    def send(self, universe):
+        if self._transport.post(self._frame):
+            return
+        if self.serial_conn is None or self._handed_over:
+            # No port, or the transport that owned it stopped (e.g. the connection was lost)
+            self.stats["frames_dropped"] += 1
+            return
+        self.serial_conn.write(self._frame)
+        self.serial_conn.flush()
+        self.stats["frames_sent"] += 1
+        self.stats["bytes_sent"] += len(self._frame)
+
+    def close(self):
+        if self.serial_conn:
+            self.serial_conn.close()
+            self.serial_conn = None
+
+    def get_stats(self):
+        transport_stats = self._transport.get_stats()
+        return {
+            "frames_sent": self.stats["frames_sent"] + transport_stats["frames_sent"],
+            "bytes_sent": self.stats["bytes_sent"] + transport_stats["bytes_sent"],
+            "frames_superseded": transport_stats["frames_superseded"],
+            "frames_dropped": self.stats["frames_dropped"],
+        }
+
+
+class UDPOutput:
+    """
+    DMX over UDP: one preallocated packet per universe, with the universe data as a view on it.
+    The packets are built by the protocol, which gives the offsets of the data and of the sequence number.
+    Packets are sent on a non-blocking socket; one that can't be sent at once is dropped, the next one
+    carries the whole universe anyway.
+    """
+
+    def __init__(self, host, port, first_universe, packets, data_offset, sequence_offset, universe_size=UNIVERSE_SIZE):
+        self.host = host
+        self.port = port
+        self.first_universe = first_universe
+        self.sock = None
+        self._packets = packets
+        self._sequence_offset = sequence_offset
+        self.universes = [np.frombuffer(packet, dtype=np.uint8, count=universe_size, offset=data_offset) for packet in packets]
+        self._sequence = 0
+        self.stats = {"frames_sent": 0, "bytes_sent": 0, "frames_dropped": 0}
+
+    def destination(self, universe):
+        return (self.host, self.port)
+
+    def describe(self):
+        return f"{self.host or 'multicast'}:{self.port}, universes {self.first_universe}-{self.first_universe + len(self._packets) - 1}"
+
+    def open(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        self.sock.setblocking(False)
+
+    def is_connected(self):
+        return self.sock is not None
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def send(self, universe):
+        if self.sock is None:
+            self.stats["frames_dropped"] += 1
+            return
+        # Sequence numbers let receivers drop out of order packets: 1-255, 0 would disable the check
+        self._sequence = self._sequence % 255 + 1
+        packet = self._packets[universe]
+        packet[self._sequence_offset] = self._sequence
+        try:
+            self.sock.sendto(packet, self.destination(self.first_universe + universe))
+        except (BlockingIOError, InterruptedError):
+            self.stats["frames_dropped"] += 1
+            return
+        self.stats["frames_sent"] += 1
+        self.stats["bytes_sent"] += len(packet)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def get_stats(self):
+        return dict(self.stats)
+
+
+def artdmx_packet(universe, universe_size=UNIVERSE_SIZE):
+    # ID, OpCode ArtDmx (LE), protocol version 14 (BE), sequence, physical, port address (LE), length (BE), data
+    header = b"Art-Net\x00" + struct.pack("<H", 0x5000) + struct.pack(">H", 14) + bytes([0, 0])
+    header += struct.pack("<H", universe & 0x7FFF) + struct.pack(">H", universe_size)
+    return bytearray(header) + bytearray(universe_size)
+
+
+def e131_packet(universe, cid, source_name, priority, universe_size=UNIVERSE_SIZE):
+    length = 126 + universe_size
+    # Root layer: preamble size, postamble size, ACN packet identifier, flags and length, vector, CID
+    packet = struct.pack(">HH12sHI16s", 0x0010, 0x0000, b"ASC-E1.17\x00\x00\x00", 0x7000 | (length - 16), 0x00000004, cid)
+    # Framing layer: flags and length, vector, source name, priority, sync address, sequence, options, universe
+    packet += struct.pack(">HI64sBHBBH", 0x7000 | (length - 38), 0x00000002, source_name.encode()[:63], priority, 0, 0, 0, universe)
+    # DMP layer: flags and length, vector, address and data type, first address, increment, value count, start code, data
+    packet += struct.pack(">HBBHHHB", 0x7000 | (length - 115), 0x02, 0xA1, 0x0000, 0x0001, universe_size + 1, 0)
+    return bytearray(packet) + bytearray(universe_size)
+
+
+class ArtNetOutput(UDPOutput):
+    """Art-Net ArtDmx packets, to host (broadcast by default). Universes are 15-bit port addresses, from 0."""
+
+    def __init__(self, host, universes=1, first_universe=0, port=ARTNET_PORT):
+        packets = [artdmx_packet(first_universe + index) for index in range(universes)]
+        super().__init__(host or "255.255.255.255", port, first_universe, packets, data_offset=18, sequence_offset=12)
+
+
+class SACNOutput(UDPOutput):
+    """
+    sACN (ANSI E1.31) data packets, to host, or to the multicast group of each universe if host is empty.
+    Universes are numbered from 1.
+    """
+
+    def __init__(self, host, universes=1, first_universe=1, port=SACN_PORT, source_name="dunebugger", priority=100):
+        # The CID identifies this source to receivers, for as long as it runs
+        cid = uuid.uuid4().bytes
+        packets = [e131_packet(first_universe + index, cid, source_name, priority) for index in range(universes)]
+        super().__init__(host, port, first_universe, packets, data_offset=126, sequence_offset=111)
+
+    def destination(self, universe):
+        if self.host:
+            return (self.host, self.port)
+        return (f"239.255.{universe >> 8}.{universe & 0xFF}", self.port)
+
+
+def create_output(output, port, baudrate, universes=1, host=None, first_universe=None):
+    """The DMX output backend: enttec (USB serial), artnet or sacn (UDP)."""
+    if output == "enttec":
+        return EnttecUsbProOutput(port, baudrate, universes)
+    if output == "artnet":
+        return ArtNetOutput(host, universes, 0 if first_universe is None else first_universe)
+    if output == "sacn":
+        return SACNOutput(host, universes, 1 if first_universe is None else first_universe)
+    raise ValueError(f"Unknown DMX output: {output}. Must be one of enttec, artnet, sacn")
@@ -0,0 +1,135 @@
+import configparser
+from os import path
+
+import numpy as np
+from dunebugger_logging import logger
+
+# Channel functions that make up the color of a fixture. A scene that sets any of them sets the
+# others to 0, so that e.g. "red" turns off the white LEDs of an RGBW fixture.
+COLOR_FUNCTIONS = ("red", "green", "blue", "white", "amber", "uv")
+
+# A DMX command addressed to a start channel that is not the start of a configured fixture drives
+# an RGB fixture there
+DEFAULT_PROFILE = "rgb"
+
+
+class SceneLibrary:
+    """
+    Fixture profiles, fixtures, groups and scenes of config/dmx.conf.
+
+    A profile is the list of channel functions of a fixture type (red, green, blue, dimmer, pan...).
+    A scene sets channel functions to values, and is compiled, for each fixture or group it is applied
+    to, into a patch: the universe channels it writes and their values. Patches of the configured
+    fixtures and groups are compiled at load, so applying a scene is a single indexed write.
+    """
+
+    def __init__(self, config_path=None, universe_size=512):
+        self.config_path = config_path or path.join(path.dirname(path.abspath(__file__)), "config/dmx.conf")
+        self.universe_size = universe_size
+        self.profiles = {}  # profile -> tuple of channel functions
+        self.fixtures = {}  # fixture -> (profile, start channel)
+        self.gammas = {}  # fixture -> gamma of its intensity (color and dimmer) channels
+        self.groups = {}  # group -> tuple of fixtures
+        self.scenes = {}  # scene -> {channel function: value}
+        self.cue_lists = {}  # cue list -> [(cue, [(scene, target), ...], crossfade secs), ...]
+        self._patches = {}  # (scene, target) -> (channel indices, values)
+        self.load()
+
+    def load(self):
+        config = configparser.ConfigParser()
+        config.optionxform = lambda x: x
+        self.profiles, self.fixtures, self.gammas, self.groups, self.scenes, self.cue_lists = {}, {}, {}, {}, {}, {}
+        self._patches = {}
+        try:
+            config.read(self.config_path)
+            for profile, values in config.items("Profiles"):
+                self.profiles[profile] = tuple(function.strip() for function in values.split(","))
+            for fixture, values in config.items("Fixtures"):
+                profile, start_channel, *gamma = [value.strip() for value in values.split(",")]
+                if profile not in self.profiles:
+                    raise ValueError(f"Fixture {fixture} has an unknown profile: {profile}")
+                self.fixtures[fixture] = (profile, int(start_channel))
+                self.gammas[fixture] = float(gamma[0]) if gamma else 1.0
+            for group, values in config.items("Groups"):
+                fixtures = tuple(fixture.strip() for fixture in values.split(","))
+                unknown = [fixture for fixture in fixtures if fixture not in self.fixtures]
+                if unknown:
+                    raise ValueError(f"Group {group} has unknown fixtures: {', '.join(unknown)}")
+                self.groups[group] = fixtures
+            for scene, values in config.items("Scenes"):
+                self.scenes[scene] = {function.strip(): int(value) for function, value in (item.split(":") for item in values.split(","))}
+            for section in config.sections():
+                if section.startswith("CueList:"):
+                    self.cue_lists[section[len("CueList:"):].strip()] = [self._parse_cue(cue, values) for cue, values in config.items(section)]
+        except (configparser.Error, ValueError) as e:
+            logger.error(f"Error reading DMX configuration: {e}")
+            return
+
+        # Precompile the scenes of the configured fixtures and groups
+        for scene in self.scenes:
+            for target in list(self.fixtures) + list(self.groups):
+                self.patch(scene, target)
+        logger.debug(f"DMX scenes loaded: {len(self.scenes)} scenes, {len(self.fixtures)} fixtures, {len(self.groups)} groups")
+
+    def _parse_cue(self, cue, values):
+        # cue = scene target + scene target ..., crossfade secs
+        look, crossfade = values.rsplit(",", 1)
+        applied = []
+        for item in look.split("+"):
+            scene, target = item.split()
+            target = int(target) if target.isdigit() else target
+            if scene not in self.scenes or not self.is_target(target):
+                raise ValueError(f"Cue {cue} has an unknown scene or target: {item.strip()}")
+            applied.append((scene, target))
+        return (cue, applied, float(crossfade))
+
+    def scene_names(self):
+        return list(self.scenes)
+
+    def is_target(self, target):
+        """Whether target is a start channel (int), a fixture or a group."""
+        if isinstance(target, int):
+            return 1 <= target <= self.universe_size
+        return target in self.fixtures or target in self.groups
+
+    def resolve(self, target):
+        """(profile functions, start channel) of each fixture addressed by target."""
+        if isinstance(target, int):
+            for profile, start_channel in self.fixtures.values():
+                if start_channel == target:
+                    return [(self.profiles[profile], start_channel)]
+            return [(self.profiles.get(DEFAULT_PROFILE, ("red", "green", "blue")), target)]
+        fixtures = self.groups.get(target, (target,))
+        return [(self.profiles[self.fixtures[fixture][0]], self.fixtures[fixture][1]) for fixture in fixtures]
+
+    def channel_gammas(self):
+        """Gamma of each channel of the universe: the gamma of its fixture on intensity channels, else 1.0."""
+        gammas = np.ones(self.universe_size)
+        for fixture, (profile, start_channel) in self.fixtures.items():
+            for offset, function in enumerate(self.profiles[profile]):
+                channel = start_channel - 1 + offset
+                if (function in COLOR_FUNCTIONS or function == "dimmer") and channel < self.universe_size:
+                    gammas[channel] = self.gammas[fixture]
+        return gammas
+
+    def patch(self, scene, target):
+        """(channel indices, uint8 values) that scene writes on target."""
+        key = (scene, target)
+        patch = self._patches.get(key)
+        if patch is not None:
+            return patch
+        if scene not in self.scenes:
+            raise ValueError(f"Scene '{scene}' not defined")
+        values = self.scenes[scene]
+        if any(function in COLOR_FUNCTIONS for function in values):
+            values = {**{function: 0 for function in COLOR_FUNCTIONS}, **values}
+        indices, patch_values = [], []
+        for profile, start_channel in self.resolve(target):
+            for offset, function in enumerate(profile):
+                channel = start_channel - 1 + offset
+                if function in values and channel < self.universe_size:
+                    indices.append(channel)
+                    patch_values.append(max(0, min(255, values[function])))
+        patch = (np.array(indices, dtype=np.intp), np.array(patch_values, dtype=np.uint8))
+        self._patches[key] = patch
+        return patch
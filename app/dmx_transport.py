@@ -0,0 +1,93 @@
+import asyncio
+import threading
+
+import serial_asyncio
+from dunebugger_logging import logger
+
+
+class DMXSerialTransport(asyncio.Protocol):
+    """
+    Non-blocking DMX frame writer on the asyncio loop, over pyserial-asyncio.
+
+    Producers (any thread) post frames to a mailbox that only holds the latest one. A single writer
+    task hands it to the serial transport when the port has room: a frame superseded before it could
+    be written is dropped instead of queued, so the output never lags behind the universe and nobody
+    waits on the USB serial port.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.transport = None
+        self.task = None
+        self._mailbox = None
+        self._mailbox_lock = threading.Lock()
+        self._frame_posted = None
+        self._can_write = None
+        self.stats = {"frames_sent": 0, "bytes_sent": 0, "frames_superseded": 0}
+
+    async def start(self, serial_instance):
+        self.loop = asyncio.get_running_loop()
+        self._frame_posted = asyncio.Event()
+        self._can_write = asyncio.Event()
+        self._can_write.set()
+        self.transport, _ = await serial_asyncio.connection_for_serial(self.loop, lambda: self, serial_instance)
+        # Pause as soon as a frame is not written at once: the next one waits in the mailbox, not in the buffer
+        self.transport.set_write_buffer_limits(high=0)
+        self.task = asyncio.create_task(self._writer())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+        self.loop = None
+
+    def is_running(self):
+        return self.task is not None and self.transport is not None
+
+    def post(self, frame):
+        """Make frame (copied) the next one to send. Returns False if the transport is not running."""
+        if not self.is_running():
+            return False
+        with self._mailbox_lock:
+            if self._mailbox is not None:
+                self.stats["frames_superseded"] += 1
+            self._mailbox = bytes(frame)
+        self.loop.call_soon_threadsafe(self._frame_posted.set)
+        return True
+
+    async def _writer(self):
+        while True:
+            await self._frame_posted.wait()
+            await self._can_write.wait()
+            self._frame_posted.clear()
+            with self._mailbox_lock:
+                frame, self._mailbox = self._mailbox, None
+            if frame is None or self.transport is None:
+                continue
+            self.transport.write(frame)
+            self.stats["frames_sent"] += 1
+            self.stats["bytes_sent"] += len(frame)
+
+    def get_stats(self):
+        return dict(self.stats)
+
+    # asyncio.Protocol
+
+    def pause_writing(self):
+        self._can_write.clear()
+
+    def resume_writing(self):
+        self._can_write.set()
+
+    def connection_lost(self, exc):
+        if exc is not None:
+            logger.error(f"DMX serial connection lost: {exc}")
+        self.transport = None
+        self._can_write.set()
@@ -88,8 +88,14 @@ class DunebuggerSettings:
                     "randomActionsMaxSecs",
                 ]:
                     return int(value)
-                elif option == "bouncingTreshold":
+                elif option in ["bouncingTreshold", "startButtonCooldownSecs"]:
                     return float(value)
+                elif option == "gpioOutputGroups":
+                    return [channel.strip() for channel in value.split(",") if channel.strip()]
+                elif option == "startButtonPolicy":
+                    if value not in ["ignore", "queue", "restart"]:
+                        raise ValueError(f"Invalid startButtonPolicy: {value}. Must be one of ignore, queue, restart")
+                    return str(value)
                 elif option in ["arduinoConnected", "eastereggEnabled"]:
                     return self.config.getboolean(section, option)
                 elif option in [
@@ -110,8 +116,8 @@ class DunebuggerSettings:
             elif section == "MessageQueue":
                 if option in ["mQueueServers", "mQueueClientID", "mQueueSubjectRoot"]:
                     return str(value)
-                elif option in ["mQueueStateCheckIntervalSecs", "mQueueCyclePlayingResolutionSecs"]:
-                    return int(value)
+                elif option == "mQueueStateMinPublishIntervalSecs":
+                    return float(value)
                 elif option == "mQueueEnabled":
                     return self.config.getboolean(section, option)
             elif section == "Audio":
@@ -146,10 +152,29 @@ class DunebuggerSettings:
             elif section == "DMX":
                 if option == "dmxEnabled":
                     return self.config.getboolean(section, option)
-                elif option == "dmxSerialPort":
+                elif option in ["dmxSerialPort", "dmxCueCacheFolder", "dmxNetworkHost"]:
                     return str(value)
                 elif option == "dmxBaudRate":
                     return int(value)
+                elif option == "dmxOutput":
+                    if value not in ["enttec", "artnet", "sacn"]:
+                        raise ValueError(f"Invalid dmxOutput: {value}. Must be enttec, artnet or sacn")
+                    return value
+                elif option == "dmxUniverses":
+                    universes = int(value)
+                    if universes < 1:
+                        raise ValueError(f"Invalid dmxUniverses: {value}. Must be at least 1")
+                    return universes
+                elif option == "dmxFirstUniverse":
+                    # Empty: the first universe of the protocol (0 for Art-Net, 1 for sACN)
+                    return int(value) if value else None
+                elif option == "dmxFrameRate":
+                    frame_rate = float(value)
+                    if not 1 <= frame_rate <= 44:
+                        raise ValueError(f"Invalid dmxFrameRate: {value}. Must be between 1 and 44 (Hz)")
+                    return frame_rate
+                elif option == "dmxKeepaliveSecs":
+                    return float(value)
 
         except (configparser.NoOptionError, ValueError) as e:
             raise ValueError(f"Invalid configuration: Section={section}, Option={option}, Value={value}. Error: {e}")
@@ -1,7 +1,19 @@
+import random
+from os import path
 from dunebugger_logging import logger
+from clock import MonotonicClock
+from dmx_handler import DMXController
+from asset_index import AssetIndex
 
 
 class MockGPIO:
+    """
+    RPi.GPIO stand-in. By default it only keeps the pin states and logs every call.
+
+    In simulator mode (see simulate) every output write and input change is recorded, with its
+    clock time, in a timeline, and inputs can be driven by scripted presses, optionally bouncing,
+    scheduled on the clock. With a VirtualClock the whole run, callbacks included, is deterministic.
+    """
 
     def __init__(self):
         self.BCM = "BCM"
@@ -13,18 +25,41 @@ class MockGPIO:
         self.PUD_UP = 1
         self.RISING = "RISING"
         self.FALLING = "FALLING"
+        self.BOTH = "BOTH"
 
         # Dictionary to store GPIO states and associated callbacks
         self.gpio_states = {}
         self.events_detect = {}
+        # Output groups (first gpio -> gpios), written like lgpio groups
+        self.groups = {}
+        # Simulator mode
+        self.verbose = True
+        self.clock = None
+        self.rng = None
+        self.timeline = None  # list of (time, gpio, value, source) when recording
+
+    def _debug(self, message):
+        if self.verbose:
+            logger.debug(message)
+
+    def simulate(self, clock=None, seed=0, verbose=False):
+        """Switch to simulator mode: start a new timeline on clock (real time by default), with seeded bounces."""
+        self.clock = clock or MonotonicClock()
+        self.rng = random.Random(seed)
+        self.verbose = verbose
+        self.timeline = []
+
+    def _record(self, gpio, value, source):
+        if self.timeline is not None:
+            self.timeline.append((round(self.clock.monotonic(), 6), gpio, value, source))
 
     def setmode(self, mode):
-        logger.debug(f"MockGPIO.setmode mode={mode}")
+        self._debug(f"MockGPIO.setmode mode={mode}")
         pass
 
     def setup(self, channels, mode, initial):
         for channel in channels:
-            logger.debug(f"MockGPIO.setup channel={channel}, mode={mode}, initial={initial}")
+            self._debug(f"MockGPIO.setup channel={channel}, mode={mode}, initial={initial}")
 
             # Set the GPIO state based on the initial value
             self.set_gpio_state(channel, {"state": initial, "mode": mode})
@@ -33,15 +68,32 @@ class MockGPIO:
         return self.gpio_states.get(gpio)["state"]
 
     def output(self, gpio, value):
-        self.set_gpio_state(gpio, value)
+        self.set_gpio_state(gpio, value, "output")
         pass
 
     def cleanup(self):
-        logger.debug("MockGPIO.cleanup")
+        self._debug("MockGPIO.cleanup")
         pass
 
+    def group_claim_output(self, gpios, levels):
+        self._debug(f"MockGPIO.group_claim_output gpios={gpios}, levels={levels}")
+        self.groups[gpios[0]] = list(gpios)
+        for gpio, level in zip(gpios, levels):
+            self.set_gpio_state(gpio, level, "output")
+
+    def group_write(self, gpio, group_bits, group_mask):
+        # Like lgpio: bit n of group_bits is the value of the n-th gpio of the group, if bit n of group_mask is set
+        self._debug(f"MockGPIO.group_write gpio={gpio}, group_bits={group_bits:#x}, group_mask={group_mask:#x}")
+        for index, member in enumerate(self.groups[gpio]):
+            if group_mask >> index & 1:
+                self.set_gpio_state(member, group_bits >> index & 1, "group")
+
+    def group_free(self, gpio):
+        self._debug(f"MockGPIO.group_free gpio={gpio}")
+        self.groups.pop(gpio, None)
+
     def setwarnings(self, mode):
-        logger.debug(f"MockGPIO.setwarnings mode={mode}")
+        self._debug(f"MockGPIO.setwarnings mode={mode}")
         pass
 
     class PWM:
@@ -54,29 +106,31 @@ class MockGPIO:
         def start(self, dutycycle):
             self.parentGPIO.output(self.gpio, GPIO.HIGH)
             self.dutycycle = dutycycle
-            logger.debug(f"MockGPIO.PWM.start duty_cycle={dutycycle}")
+            self.parentGPIO._debug(f"MockGPIO.PWM.start duty_cycle={dutycycle}")
             pass
 
         def ChangeDutyCycle(self, dutycycle):
-            logger.debug(f"MockGPIO.PWM.start ChangeDutyCycle={dutycycle}")
+            self.parentGPIO._debug(f"MockGPIO.PWM.start ChangeDutyCycle={dutycycle}")
             self.dutycycle = dutycycle
             pass
 
     def remove_event_detect(self, gpio):
-        logger.debug(f"MockGPIO.remove_event_detect gpio={gpio}")
-        pass
+        self._debug(f"MockGPIO.remove_event_detect gpio={gpio}")
+        for mode in (self.RISING, self.FALLING, self.BOTH):
+            self.events_detect.pop((gpio, mode), None)
 
     def add_event_detect(self, gpio, mode, callback, bouncetime=0):
-        logger.debug(f"MockGPIO.add_event_detect gpio={gpio}, mode={mode}, callback={callback}, bouncetime={bouncetime}")
+        self._debug(f"MockGPIO.add_event_detect gpio={gpio}, mode={mode}, callback={callback}, bouncetime={bouncetime}")
         # Associate the callback with the GPIO and mode
         self.events_detect[(gpio, mode)] = callback
 
-    def set_gpio_state(self, gpio, value):
+    def set_gpio_state(self, gpio, value, source="input"):
         if self.gpio_states.get(gpio) is None:
             self.gpio_states[gpio] = value
             return
         elif self.gpio_states.get(gpio)["mode"] == self.OUT:
             self.gpio_states[gpio]["state"] = value
+            self._record(gpio, int(value), source)
             return
         else:
             if self.gpio_states.get(gpio)["state"] < value:
@@ -86,8 +140,9 @@ class MockGPIO:
             else:
                 return
             self.gpio_states[gpio]["state"] = value
+            self._record(gpio, value, source)
             # Check if there is a callback associated with the GPIO and mode
-            callback = self.events_detect.get((gpio, mode), None)
+            callback = self.events_detect.get((gpio, mode), self.events_detect.get((gpio, self.BOTH), None))
 
             if callback is not None:
                 # If callback exists and value is True, invoke the callback
@@ -99,5 +154,159 @@ class MockGPIO:
     def get_gpio_state(self, gpio):
         return self.gpio_states.get(gpio)["state"]
 
+    # Simulator mode: input injection
+
+    def inject_input(self, gpio, value, delay=0):
+        """Set input gpio to value after delay seconds of the simulator clock (now if delay is 0)."""
+        if delay <= 0:
+            self.set_gpio_state(gpio, value)
+        else:
+            self.clock.call_later(delay, lambda: self.set_gpio_state(gpio, value))
+
+    def inject_script(self, script):
+        """Schedule a list of (delay, gpio, value) input changes."""
+        for delay, gpio, value in script:
+            self.inject_input(gpio, value, delay)
+
+    def press(self, gpio, delay=0, hold_secs=0.5, level=1, bounces=0, bounce_secs=0.005):
+        """
+        Schedule a press of a button (or the touch of a limit switch) on input gpio: it goes to level
+        after delay and back after hold_secs. Each transition chatters bounces times, with random gaps
+        of up to bounce_secs, before it settles. Returns the delay of the release.
+        """
+        release = delay + hold_secs
+        script = self._bouncing(gpio, delay, level, bounces, bounce_secs)
+        script += self._bouncing(gpio, release, 1 - level, bounces, bounce_secs)
+        self.inject_script(script)
+        return release
+
+    def _bouncing(self, gpio, delay, level, bounces, bounce_secs):
+        script = []
+        for _ in range(bounces):
+            script.append((delay, gpio, level))
+            delay += self.rng.uniform(0, bounce_secs)
+            script.append((delay, gpio, 1 - level))
+            delay += self.rng.uniform(0, bounce_secs)
+        script.append((delay, gpio, level))
+        return script
+
+    # Simulator mode: inspection
+
+    def get_timeline(self, gpio=None, source=None, since=None):
+        """Recorded (time, gpio, value, source) changes, optionally filtered by gpio, source and start time."""
+        return [
+            entry
+            for entry in self.timeline or []
+            if (gpio is None or entry[1] == gpio) and (source is None or entry[3] == source) and (since is None or entry[0] >= since)
+        ]
+
+    def get_writes(self, gpio):
+        """(time, value) of every write to output gpio, grouped writes included."""
+        return [(time, value) for time, _, value, source in self.get_timeline(gpio) if source != "input"]
+
+    def get_state_at(self, gpio, at):
+        """Value of gpio at time at, according to the timeline (None if it was never recorded by then)."""
+        state = None
+        for time, _, value, _ in self.get_timeline(gpio):
+            if time > at:
+                break
+            state = value
+        return state
+
+    def clear_timeline(self):
+        if self.timeline is not None:
+            self.timeline.clear()
+
+
+class MockAudioPlayer:
+    """Audio sink for simulations: records what would be played instead of driving VLC."""
+
+    def __init__(self, clock, event_log):
+        self.clock = clock
+        self.event_log = event_log
+        self.musicVolume = 0
+        self.sfxVolume = 0
+        self.eastereggTriggered = False
+        self.audio_available = False
+        self.asset_index = AssetIndex(lambda name: True)
+
+    def _record(self, description):
+        self.event_log.append((round(self.clock.monotonic(), 6), f"audio {description}"))
+
+    def get_music_path(self, music_folder):
+        return path.join("/opt/dunebugger-data/music", music_folder)
+
+    def get_sfx_filepath(self, sfx_file):
+        return path.join("/opt/dunebugger-data/sfx", sfx_file)
+
+    def index_music_folder(self, music_folder):
+        self.asset_index.refresh(music_folder)
+
+    def playMusic(self, music_folder):
+        self._record(f"play music {music_folder}")
+
+    def play_sfx(self, sfx_file):
+        self._record(f"play sfx {sfx_file}")
+
+    def vstopaudio(self, fadeout_secs=3):
+        self._record(f"stop audio with {fadeout_secs}s fadeout")
+
+    def pause_audio(self):
+        self._record("pause")
+
+    def resume_audio(self):
+        self._record("resume")
+
+    def setEasterEggTrigger(self, easter_egg_trigger):
+        self.eastereggTriggered = easter_egg_trigger
+
+    def get_music_volume(self):
+        return self.musicVolume
+
+    def get_sfx_volume(self):
+        return self.sfxVolume
+
+
+class MockDMXController(DMXController):
+    """DMX sink for simulations: validates commands like the real controller and records them, without a serial port."""
+
+    def __init__(self, clock, event_log):
+        self.clock = clock
+        self.event_log = event_log
+        super().__init__(port=None)
+
+    def connect(self):
+        self._connected = True
+
+    def is_connected(self):
+        return self._connected
+
+    def _record(self, description):
+        self.event_log.append((round(self.clock.monotonic(), 6), f"dmx {description}"))
+
+    def set_scene(self, scene_name, target=1):
+        self._record(f"set {target} {scene_name}")
+
+    def fade_to_scene(self, scene_name, target=1, duration=2.0, curve="linear"):
+        self._record(f"fade {target} {scene_name} {duration}{'' if curve == 'linear' else f' {curve}'}")
+
+    def set_dimmer(self, intensity, target):
+        self._record(f"dimmer {target} {intensity}")
+
+    def fade_to_dimmer(self, intensity, target, duration, curve="linear"):
+        self._record(f"fade_dimmer {target} {intensity} {duration}{'' if curve == 'linear' else f' {curve}'}")
+
+    def go_cue(self, cue, cue_list=None, crossfade=True):
+        self._record(f"cue {cue_list} {cue}{'' if crossfade else ' look'}")
+
+    def pause(self):
+        self._record("pause")
+
+    def resume(self):
+        self._record("resume")
+
+    def disconnect(self):
+        self._connected = False
+
 
 GPIO = MockGPIO()
@@ -1,13 +1,19 @@
 import configparser
+import os
 from ast import literal_eval
 from os import path
 import re
 import atexit
 from dunebugger_logging import logger
 from dunebugger_settings import settings
+from input_events import InputDebouncer
 
 if settings.ON_RASPBERRY_PI:
     import RPi.GPIO as GPIO  # type: ignore
+    try:
+        import lgpio  # type: ignore
+    except ImportError:
+        lgpio = None
 else:
     from dunemock import GPIO
 
@@ -27,16 +33,46 @@ else:
 #     Ch1FOu = "o\n"
 
 
+class LgpioGroups:
+    """lgpio group operations on the gpiochip used by rpi-lgpio, with the same methods as MockGPIO."""
+
+    def __init__(self):
+        self.handle = lgpio.gpiochip_open(int(os.environ.get("RPI_LGPIO_CHIP", 0)))
+
+    def group_claim_output(self, gpios, levels):
+        # The pins were claimed one by one by RPi.GPIO at setup: release them before claiming the group,
+        # and set them up again if the claim fails, so they can still be written one at a time
+        GPIO.cleanup(list(gpios))
+        try:
+            lgpio.group_claim_output(self.handle, list(gpios), levels)
+        except Exception:
+            for gpio, level in zip(gpios, levels):
+                GPIO.setup(gpio, GPIO.OUT, initial=GPIO.HIGH if level else GPIO.LOW)
+            raise
+
+    def group_write(self, gpio, group_bits, group_mask):
+        lgpio.group_write(self.handle, gpio, group_bits, group_mask)
+
+    def group_free(self, gpio):
+        lgpio.group_free(self.handle, gpio)
+
+
 class GPIOHandler:
-    def __init__(self, state_tracker):
+    def __init__(self, state_tracker, clock=None):
         # Load GPIO configuration from gpio_config.conf
         self.GPIOMap = {}
         self.channelsSetup = {}
         self.channels = {}
         self.logicalChannels = {}
+        self.pinLabels = {}  # pin -> GPIOMap label, built at load time
+        # Shadow register: the mode of every pin and the last value written to each output,
+        # so status queries and mode checks don't go to the hardware
+        self.pinModes = {}
+        self.outputStates = {}
         self.load_gpio_configuration()
         self.GPIO = GPIO
         self.state_tracker = state_tracker
+        self.input_debouncer = InputDebouncer(GPIO, clock)
         # Initialize GPIO
         GPIO.setwarnings(False)
         GPIO.setmode(GPIO.BCM)
@@ -49,9 +85,38 @@ class GPIOHandler:
                     GPIO.OUT,
                     initial=GPIO.HIGH if initial_state == "HIGH" else GPIO.LOW,
                 )
+                for gpio in self.channels[channel]:
+                    self.pinModes[gpio] = GPIO.OUT
+                    self.outputStates[gpio] = 1 if initial_state == "HIGH" else 0
             elif pin_setup == "IN" and (initial_state == "DOWN" or initial_state == "UP"):
                 pull_up_down = GPIO.PUD_UP if initial_state == "UP" else GPIO.PUD_DOWN
                 GPIO.setup(self.channels[channel], GPIO.IN, pull_up_down)
+                for gpio in self.channels[channel]:
+                    self.pinModes[gpio] = GPIO.IN
+
+        # Pins that are not configured keep the mode they had at startup
+        for gpio in range(0, 28):
+            if gpio not in self.pinModes:
+                try:
+                    self.pinModes[gpio] = GPIO.gpio_function(gpio)
+                except Exception:
+                    self.pinModes[gpio] = None
+
+        # Output channels listed in gpioOutputGroups (e.g. the relay banks) are written with one group write
+        self.outputGroups = {}  # channel -> gpios, the first one identifies the group
+        self.pinGroups = {}  # gpio -> channel
+        if not settings.ON_RASPBERRY_PI:
+            self.groupGPIO = GPIO
+        elif lgpio is not None:
+            try:
+                self.groupGPIO = LgpioGroups()
+            except Exception as e:
+                self.groupGPIO = None
+                logger.warning(f"Can't open the gpiochip with lgpio, output groups are written one pin at a time: {e}")
+        else:
+            self.groupGPIO = None
+            logger.warning("lgpio not available: output groups are written one pin at a time")
+        self.claim_output_groups()
 
         atexit.register(self.clean_gpios)
 
@@ -103,6 +168,10 @@ class GPIOHandler:
                 logger.error(f"Error reading LogicalChannels configuration: {e}")
                 # Handle the error as needed
 
+            # Reverse index. Like a scan of GPIOMap, the first label of a pin wins
+            for label, gpio in self.GPIOMap.items():
+                self.pinLabels.setdefault(gpio, label)
+
             # Check if StartButton entry exists in GPIOMap
             if settings.startButtonGPIOName not in self.GPIOMap:
                 raise ValueError(f"GPIOMap must have an entry for {settings.startButtonGPIOName}")
@@ -112,11 +181,8 @@ class GPIOHandler:
             # You might want to handle the error in an appropriate way, e.g., logging or quitting the program
 
     def getGPIOLabel(self, GPIONum):
-        for key, value in self.GPIOMap.items():
-            if value == GPIONum:
-                return key
-            # Return None if the value is not found
-        return None
+        # Return None if the value is not found
+        return self.pinLabels.get(GPIONum)
 
     def __extract_variable_info(solf, expression):
         """
@@ -142,20 +208,56 @@ class GPIOHandler:
         else:
             return None, None
 
-    def addEventDetect(self, gpioName, callback, bounceMs=0):
+    async def start_input_events(self):
+        await self.input_debouncer.start()
+
+    async def stop_input_events(self):
+        await self.input_debouncer.stop()
+
+    def subscribe_input(self, gpioName, callback, stableSecs):
+        """
+        Call callback(InputEvent) on the event loop when the input goes HIGH and stays HIGH for stableSecs.
+        callback can be a coroutine function; it must not block the loop.
+        """
         gpio = self.GPIOMap[gpioName]
-        if bounceMs > 0:
-            GPIO.add_event_detect(gpio, GPIO.RISING, callback=callback, bouncetime=bounceMs)
-        else:
-            GPIO.add_event_detect(gpio, GPIO.RISING, callback=callback)
+        if self.input_debouncer.subscribe(gpio, gpioName, callback, stableSecs):
+            # Both edges restart the stable time, so a short glitch is rejected
+            GPIO.add_event_detect(gpio, GPIO.BOTH, callback=self.input_debouncer.push_edge)
 
-    def removeEventDetect(self, gpioName):
+    def unsubscribe_input(self, gpioName):
         gpio = self.GPIOMap[gpioName]
         logger.debug(f"Removing interrupt on {self.getGPIOLabel(gpio)}")
         GPIO.remove_event_detect(gpio)
+        self.input_debouncer.unsubscribe(gpio)
+
+    def get_input_stats(self, gpioName):
+        """Edge, bounce, glitch and event counters of an input, with the edge-to-event latency of its debounce."""
+        return self.input_debouncer.get_stats(self.GPIOMap[gpioName])
+
+    def claim_output_groups(self):
+        if self.groupGPIO is None:
+            return
+        for channel in settings.gpioOutputGroups:
+            gpios = self.channels.get(channel)
+            if gpios is None or self.channelsSetup.get(channel, [None])[0] != "OUT":
+                logger.warning(f"Output group {channel} is not an output channel")
+                continue
+            try:
+                self.groupGPIO.group_claim_output(list(gpios), [self.outputStates[gpio] for gpio in gpios])
+            except Exception as e:
+                logger.warning(f"Can't claim output group {channel}, its pins are written one at a time: {e}")
+                continue
+            self.outputGroups[channel] = gpios
+            for gpio in gpios:
+                self.pinGroups[gpio] = channel
 
     def clean_gpios(self):
         logger.debug("Cleanup GPIOs")
+        for gpios in self.outputGroups.values():
+            try:
+                self.groupGPIO.group_free(gpios[0])
+            except Exception as e:
+                logger.warning(f"Error freeing output group of GPIO {gpios[0]}: {e}")
         GPIO.cleanup()
         self.state_tracker.notify_update("gpios")
 
@@ -171,7 +273,7 @@ class GPIOHandler:
         if gpiomap is not None:
             if gpiomode == self.GPIO.OUT or (not settings.ON_RASPBERRY_PI):
                 logger.debug(f"{gpiomap} {value}")
-                GPIO.output(gpio, value)
+                self.gpio_write(gpio, value)
                 self.state_tracker.notify_update("gpios")
                 return None
             elif gpiomode == self.GPIO.IN and settings.ON_RASPBERRY_PI:
@@ -183,9 +285,53 @@ class GPIOHandler:
             logger.error(reply_message)
             return reply_message    
 
+    def gpio_write_outputs(self, values):
+        """Set several outputs already resolved to GPIO numbers (gpio -> value), e.g. a compiled sequence frame."""
+        if settings.ON_RASPBERRY_PI:
+            inputs = [gpio for gpio in values if self.pinModes.get(gpio) == GPIO.IN]
+            if inputs:
+                logger.error(f"Can't set an input GPIO. GPIO: {', '.join(str(gpio) for gpio in inputs)}.")
+                values = {gpio: value for gpio, value in values.items() if gpio not in inputs}
+        if values:
+            self.gpio_write_many(values)
+            self.state_tracker.notify_update("gpios")
+
+    def gpio_write(self, gpio, value):
+        """Write an output and keep the shadow register in sync. Every output write goes through here."""
+        self.gpio_write_many({gpio: value})
+
+    def gpio_write_many(self, values):
+        """Write several outputs (gpio -> value): one group write per output group, per-pin writes for the rest."""
+        group_values = {}
+        for gpio, value in values.items():
+            channel = self.pinGroups.get(gpio)
+            if channel is None:
+                GPIO.output(gpio, value)
+            else:
+                group_values.setdefault(channel, {})[gpio] = value
+        for channel, channel_values in group_values.items():
+            gpios = self.outputGroups[channel]
+            group_bits = 0
+            group_mask = 0
+            for index, gpio in enumerate(gpios):
+                if gpio in channel_values:
+                    group_mask |= 1 << index
+                    if channel_values[gpio]:
+                        group_bits |= 1 << index
+            self.groupGPIO.group_write(gpios[0], group_bits, group_mask)
+        for gpio, value in values.items():
+            if self.pinModes.get(gpio) == GPIO.OUT:
+                self.outputStates[gpio] = 1 if value else 0
+
+    def gpio_read(self, gpio):
+        """Value of a pin: outputs from the shadow register, inputs from the hardware."""
+        if gpio in self.outputStates:
+            return self.outputStates[gpio]
+        return GPIO.input(gpio)
+
     def gpiomap_toggle_output(self, gpiomap):
         logger.debug(f"Toggling {gpiomap}")
-        self.gpio_set_output(gpiomap, not GPIO.input(self.GPIOMap[gpiomap]))
+        self.gpio_set_output(gpiomap, not self.gpio_read(self.GPIOMap[gpiomap]))
 
     def __gpiomap_get_gpio(self, gpiomap):
         try:
@@ -194,6 +340,8 @@ class GPIOHandler:
             return None
 
     def __gpio_get_mode(self, gpio):
+        if gpio in self.pinModes:
+            return self.pinModes[gpio]
         try:
             return self.GPIO.gpio_function(gpio)
         except Exception:
@@ -207,22 +355,23 @@ class GPIOHandler:
             mode = "UNKNOWN"
             state = "UNKNOWN"
             switchstate = "UNKNOWN"
-            label = self.getGPIOLabel(gpio) if self.getGPIOLabel(gpio) is not None else "_not_found_"
+            label = self.pinLabels.get(gpio, "_not_found_")
 
-            # Determine mode
-            try:
-                if self.GPIO.gpio_function(gpio) == self.GPIO.IN:
-                    mode = "INPUT"
-                elif self.GPIO.gpio_function(gpio) == self.GPIO.OUT:
-                    mode = "OUTPUT"
-            except Exception:
+            # Determine mode, from the shadow register
+            gpiomode = self.__gpio_get_mode(gpio)
+            if gpiomode is None:
                 mode = "ERROR"
+            elif gpiomode == self.GPIO.IN:
+                mode = "INPUT"
+            elif gpiomode == self.GPIO.OUT:
+                mode = "OUTPUT"
 
-            # Read state
+            # Read state: only inputs are read from the hardware
             if mode == "INPUT" or mode == "OUTPUT":
                 try:
-                    state = "HIGH" if self.GPIO.input(gpio) == 1 else "LOW"
-                    switchstate = "OFF" if self.GPIO.input(gpio) == 1 else "ON"
+                    value = self.gpio_read(gpio)
+                    state = "HIGH" if value == 1 else "LOW"
+                    switchstate = "OFF" if value == 1 else "ON"
                 except Exception:
                     state = "ERROR"
                     switchstate = "ERROR"
@@ -0,0 +1,141 @@
+import asyncio
+from collections import namedtuple
+
+from dunebugger_logging import logger
+from clock import MonotonicClock
+
+# A debounced input event. edge_time is the monotonic time of the first edge of the burst,
+# so a subscriber can measure its edge-to-action latency.
+InputEvent = namedtuple("InputEvent", ["gpio", "label", "edge_time", "confirm_time"])
+
+
+class InputSubscription:
+    def __init__(self, gpio, label, stable_secs, level, stable_level, stats):
+        self.gpio = gpio
+        self.label = label
+        self.stable_secs = stable_secs
+        self.level = level
+        self.stable_level = stable_level
+        self.callbacks = []
+        self.first_edge_time = None
+        self.confirm_timer = None
+        self.stats = stats
+
+
+class InputDebouncer:
+    """
+    Software debounce of GPIO inputs.
+
+    The GPIO callback threads only push (gpio, monotonic timestamp) edges into a queue. The engine runs
+    on the event loop: every edge restarts the stable time of its input, and once the input has been
+    stable for that long it is read back. A change to the subscribed level is dispatched to the
+    subscribers, a change back to rest is a release, and a burst that ends at the previous stable level
+    is a glitch and is dropped.
+
+    Timestamps and stable timers come from clock, so simulated inputs can be debounced on a VirtualClock.
+    """
+
+    def __init__(self, GPIO, clock=None):
+        self.GPIO = GPIO
+        self.clock = clock or MonotonicClock()
+        self.loop = None
+        self.queue = None
+        self.task = None
+        self.inputs = {}  # gpio -> InputSubscription
+        self.stats = {}  # gpio -> counters, kept across subscriptions
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._process_edges())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        for subscription in self.inputs.values():
+            if subscription.confirm_timer is not None:
+                subscription.confirm_timer.cancel()
+                subscription.confirm_timer = None
+        self.loop = None
+
+    def subscribe(self, gpio, label, callback, stable_secs, level=1):
+        """Returns True if this is the first subscription of gpio (the edge detection must be added)."""
+        subscription = self.inputs.get(gpio)
+        first = subscription is None
+        if first:
+            stats = self.stats.setdefault(gpio, {"edges": 0, "bounces": 0, "glitches": 0, "events": 0, "last_latency": 0.0, "max_latency": 0.0})
+            subscription = InputSubscription(gpio, label, stable_secs, level, self.GPIO.input(gpio), stats)
+            self.inputs[gpio] = subscription
+        # Subscribing the same callback again must not run it twice per event
+        if callback not in subscription.callbacks:
+            subscription.callbacks.append(callback)
+        return first
+
+    def unsubscribe(self, gpio):
+        subscription = self.inputs.pop(gpio, None)
+        if subscription is not None and subscription.confirm_timer is not None and self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(subscription.confirm_timer.cancel)
+
+    def push_edge(self, gpio):
+        # Called on the GPIO callback thread: take the timestamp and return immediately
+        edge_time = self.clock.monotonic()
+        if self.loop is None:
+            logger.debug(f"Input events not started: edge on GPIO {gpio} ignored")
+            return
+        if self.in_loop():
+            # Simulated inputs are injected on the loop itself: no thread hop, so their order is kept
+            self.handle_edge(gpio, edge_time)
+            return
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, (gpio, edge_time))
+
+    def in_loop(self):
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    async def _process_edges(self):
+        while True:
+            gpio, edge_time = await self.queue.get()
+            self.handle_edge(gpio, edge_time)
+
+    def handle_edge(self, gpio, edge_time):
+        subscription = self.inputs.get(gpio)
+        if subscription is None:
+            return
+        subscription.stats["edges"] += 1
+        if subscription.confirm_timer is not None:
+            subscription.confirm_timer.cancel()
+            subscription.stats["bounces"] += 1
+        else:
+            subscription.first_edge_time = edge_time
+        delay = max(0, edge_time + subscription.stable_secs - self.clock.monotonic())
+        subscription.confirm_timer = self.clock.call_later(delay, lambda: self.confirm(subscription))
+
+    def confirm(self, subscription):
+        subscription.confirm_timer = None
+        level = self.GPIO.input(subscription.gpio)
+        if level == subscription.stable_level:
+            subscription.stats["glitches"] += 1
+            logger.debug(f"Glitch on {subscription.label}: not stable for {subscription.stable_secs}s")
+            return
+        subscription.stable_level = level
+        if level != subscription.level:
+            return
+        event = InputEvent(subscription.gpio, subscription.label, subscription.first_edge_time, self.clock.monotonic())
+        latency = event.confirm_time - event.edge_time
+        subscription.stats["events"] += 1
+        subscription.stats["last_latency"] = latency
+        subscription.stats["max_latency"] = max(subscription.stats["max_latency"], latency)
+        for callback in subscription.callbacks:
+            if asyncio.iscoroutinefunction(callback):
+                self.loop.create_task(callback(event))
+            else:
+                self.loop.call_soon(callback, event)
+
+    def get_stats(self, gpio):
+        return dict(self.stats[gpio]) if gpio in self.stats else None
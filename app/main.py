@@ -2,7 +2,7 @@
 import asyncio
 
 # from dunebugger_settings import settings
-from class_factory import terminal_interpreter, mqueue, state_tracker, initialization_handler
+from class_factory import terminal_interpreter, mqueue, state_tracker, initialization_handler, sequence_handler, mygpio_handler, dmx_handler
 from dunebugger_logging import update_queue_logging_handler_loop
 
 
@@ -17,6 +17,11 @@ async def main():
         await asyncio.sleep(2)
         # Start the state monitoring task
         await state_tracker.start_state_monitoring()
+        # Start the GPIO input events (debounce) and the cycle runner on this loop
+        await mygpio_handler.start_input_events()
+        await sequence_handler.start_cycle_runner()
+        # DMX frames go out through the async serial writer
+        await dmx_handler.start_transport()
 
         # Execute initialization commands if any
         await initialization_handler.execute_initialization_commands()
@@ -38,6 +43,25 @@ async def main():
         except Exception as e:
             print(f"Error stopping state monitoring: {e}")
 
+        # Cancel a running cycle and release the output executors
+        try:
+            await sequence_handler.stop_cycle_runner()
+            print("Cycle runner stopped.")
+        except Exception as e:
+            print(f"Error stopping cycle runner: {e}")
+
+        try:
+            await mygpio_handler.stop_input_events()
+            print("Input events stopped.")
+        except Exception as e:
+            print(f"Error stopping input events: {e}")
+
+        try:
+            await dmx_handler.stop_transport()
+            print("DMX transport stopped.")
+        except Exception as e:
+            print(f"Error stopping DMX transport: {e}")
+
         # Close NATS connection
         await mqueue.close_listener()
  
@@ -1,17 +1,20 @@
-import time
 import atexit
 import threading
 from dunebugger_logging import logger
 from dunebugger_settings import settings
 from pwm_handler import PWMHandler
+from clock import MonotonicClock
 
 
 class MotorController:
-    def __init__(self, mygpio_handler, GPIO):
+    def __init__(self, mygpio_handler, GPIO, clock=None):
         self.mygpio_handler = mygpio_handler
         self.GPIO = GPIO
+        # Sleeps and blocking calls go through the clock, so the limit switch moves run on a VirtualClock too
+        self.clock = clock if clock is not None else MonotonicClock()
         self.pwm_motor1 = PWMHandler(GPIO, mygpio_handler.GPIOMap["Motor1PWM"], settings.motor1Freq)
         self.pwm_motor2 = PWMHandler(GPIO, mygpio_handler.GPIOMap["Motor2PWM"], settings.motor2Freq)
+        self.limits_subscribed = False
 
     def start(self, motornum, rotation="cw", speed=100):
         logger.debug(f"motor {motornum} start with rotation {rotation} and speed {speed}")
@@ -22,11 +25,11 @@ class MotorController:
             return
 
         if rotation == "cw":
-            self.GPIO.output(self.mygpio_handler.GPIOMap[f"Motor{motornum}In1"], self.GPIO.HIGH)
-            self.GPIO.output(self.mygpio_handler.GPIOMap[f"Motor{motornum}In2"], self.GPIO.LOW)
+            self.mygpio_handler.gpio_write(self.mygpio_handler.GPIOMap[f"Motor{motornum}In1"], self.GPIO.HIGH)
+            self.mygpio_handler.gpio_write(self.mygpio_handler.GPIOMap[f"Motor{motornum}In2"], self.GPIO.LOW)
         else:
-            self.GPIO.output(self.mygpio_handler.GPIOMap[f"Motor{motornum}In1"], self.GPIO.LOW)
-            self.GPIO.output(self.mygpio_handler.GPIOMap[f"Motor{motornum}In2"], self.GPIO.HIGH)
+            self.mygpio_handler.gpio_write(self.mygpio_handler.GPIOMap[f"Motor{motornum}In1"], self.GPIO.LOW)
+            self.mygpio_handler.gpio_write(self.mygpio_handler.GPIOMap[f"Motor{motornum}In2"], self.GPIO.HIGH)
 
         if motornum == 1:
             self.pwm_motor1.set_duty_cycle(speed)
@@ -35,26 +38,26 @@ class MotorController:
 
     def stop(self, motornum):
         logger.debug(f"motor {motornum} stopping")
-        self.GPIO.output(self.mygpio_handler.GPIOMap[f"Motor{motornum}In1"], self.GPIO.LOW)
-        self.GPIO.output(self.mygpio_handler.GPIOMap[f"Motor{motornum}In2"], self.GPIO.LOW)
-        self.GPIO.output(self.mygpio_handler.GPIOMap[f"Motor{motornum}PWM"], self.GPIO.LOW)
+        self.mygpio_handler.gpio_write(self.mygpio_handler.GPIOMap[f"Motor{motornum}In1"], self.GPIO.LOW)
+        self.mygpio_handler.gpio_write(self.mygpio_handler.GPIOMap[f"Motor{motornum}In2"], self.GPIO.LOW)
+        self.mygpio_handler.gpio_write(self.mygpio_handler.GPIOMap[f"Motor{motornum}PWM"], self.GPIO.LOW)
 
-    def limitTouch(self, channel, event=None):
-        time.sleep(settings.bouncingTreshold + 0.23)  # avoid catching a bouncing
-        if self.GPIO.input(channel) != 1:
-            return
+    async def on_limit_touch(self, input_event, event=None):
+        # Debounced by the GPIO handler; limitTouch moves the motor with sleeps, so it runs off the loop
+        await self.clock.run_blocking(None, self.limitTouch, input_event.gpio, event)
 
+    def limitTouch(self, channel, event=None):
         GPIOLabel = self.mygpio_handler.getGPIOLabel(channel)
         logger.debug(f"Limit touched on channel {GPIOLabel}")
         motornum = 1 if channel in (self.mygpio_handler.GPIOMap["In_Motor1LimitCCW"], self.mygpio_handler.GPIOMap["In_Motor1LimitCW"]) else 2
         self.stop(motornum)
 
         if channel == self.mygpio_handler.GPIOMap[f"In_Motor{motornum}LimitCCW"]:
-            time.sleep(0.2)
+            self.clock.sleep(0.2)
             self.start(motornum, "cw", speed=100)
         elif event is not None:
             self.start(motornum, "ccw", speed=85)
-            time.sleep(3)
+            self.clock.sleep(3)
             self.stop(motornum)
             logger.debug("Event set")
             event.set()
@@ -65,7 +68,7 @@ class MotorController:
             pos = "CW limit touch"
             logger.debug(f"Motor {motornum} position is {pos}. Short CCW and then CW.")
             self.start(motornum, "ccw", 100)
-            time.sleep(0.5)
+            self.clock.sleep(0.5)
             return
         elif self.GPIO.input(self.mygpio_handler.GPIOMap[f"In_Motor{motornum}LimitCCW"]) == self.GPIO.HIGH:
             pos = "CCW limit touch"
@@ -76,29 +79,13 @@ class MotorController:
 
     def motor_clean(self):
         logger.info("Motor remove events detect")
-        self.mygpio_handler.removeEventDetect("In_Motor1LimitCCW")
-        self.mygpio_handler.removeEventDetect("In_Motor1LimitCW")
-        self.mygpio_handler.removeEventDetect("In_Motor2LimitCCW")
-        self.mygpio_handler.removeEventDetect("In_Motor2LimitCW")
+        self.mygpio_handler.unsubscribe_input("In_Motor1LimitCCW")
+        self.mygpio_handler.unsubscribe_input("In_Motor1LimitCW")
+        self.mygpio_handler.unsubscribe_input("In_Motor2LimitCCW")
+        self.mygpio_handler.unsubscribe_input("In_Motor2LimitCW")
 
     def initMotorLimits(self):
-        atexit.register(self.motor_clean)
-        motor1_reset_event = threading.Event()
-
-        def motor1_callback_with_params(channel):
-            self.limitTouch(channel, motor1_reset_event)
-
-        self.mygpio_handler.addEventDetect("In_Motor1LimitCCW", self.limitTouch, 5)
-        self.mygpio_handler.addEventDetect("In_Motor1LimitCW", motor1_callback_with_params, 5)
-
-        motor2_reset_event = threading.Event()
-
-        def motor2_callback_with_params(channel):
-            self.limitTouch(channel, motor2_reset_event)
-
-        self.mygpio_handler.addEventDetect("In_Motor2LimitCCW", self.limitTouch, 5)
-        self.mygpio_handler.addEventDetect("In_Motor2LimitCW", motor2_callback_with_params, 5)
-
+        motor1_reset_event, motor2_reset_event = self.subscribe_limits()
         if settings.motor1Enabled:
             self.reset(1)
         if settings.motor1Enabled:
@@ -107,3 +94,31 @@ class MotorController:
             self.reset(2)
         if settings.motor2Enabled:
             motor2_reset_event.wait()
+
+    def subscribe_limits(self):
+        """Subscribe the limit switches. Returns the events set when each motor is back from its CW limit."""
+        if self.limits_subscribed:
+            # initMotorLimits again: the callbacks subscribed before would set the previous reset events
+            for gpioName in ["In_Motor1LimitCCW", "In_Motor1LimitCW", "In_Motor2LimitCCW", "In_Motor2LimitCW"]:
+                self.mygpio_handler.unsubscribe_input(gpioName)
+        else:
+            atexit.register(self.motor_clean)
+        self.limits_subscribed = True
+        # Limit switches must be stable for longer than the start button before they count
+        limit_stable_secs = settings.bouncingTreshold + 0.23
+        motor1_reset_event = threading.Event()
+
+        async def motor1_callback_with_params(input_event):
+            await self.on_limit_touch(input_event, motor1_reset_event)
+
+        self.mygpio_handler.subscribe_input("In_Motor1LimitCCW", self.on_limit_touch, limit_stable_secs)
+        self.mygpio_handler.subscribe_input("In_Motor1LimitCW", motor1_callback_with_params, limit_stable_secs)
+
+        motor2_reset_event = threading.Event()
+
+        async def motor2_callback_with_params(input_event):
+            await self.on_limit_touch(input_event, motor2_reset_event)
+
+        self.mygpio_handler.subscribe_input("In_Motor2LimitCCW", self.on_limit_touch, limit_stable_secs)
+        self.mygpio_handler.subscribe_input("In_Motor2LimitCW", motor2_callback_with_params, limit_stable_secs)
+        return motor1_reset_event, motor2_reset_event
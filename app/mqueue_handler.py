@@ -2,6 +2,7 @@ import asyncio
 import json
 from dunebugger_logging import enable_queue_logging, logger
 from dunebugger_settings import settings
+from versioned_state import VersionedState
 
 
 class MessagingQueueHandler:
@@ -12,6 +13,8 @@ class MessagingQueueHandler:
         self.sequence_handler = sequence_handler
         self.mygpio_handler = mygpio_handler
         self.command_interpreter = command_interpreter
+        # State changes are published as deltas; refresh requests get a full snapshot (or a delta from the client epoch and revision)
+        self.state = VersionedState()
         
         # Only enable queue logging if both sendLogsToQueue and mQueueEnabled are True
         if settings.sendLogsToQueue and settings.mQueueEnabled:
@@ -43,13 +46,14 @@ class MessagingQueueHandler:
                 return command_reply_message
             elif subject in ["refresh_sequence"]:
                 await self.send_sequence()
-                await self.send_sequence_state()
+                await self.send_sequence_snapshot(*self.get_requested_revision(message_json))
                 await self.send_playing_time()
             elif subject in ["get_sequence"]:
                 await self.send_sequence()
             elif subject in ["refresh_gpios"]:
-                await self.send_gpio_state()
-                await self.send_sequence_state()
+                since_revision, since_epoch = self.get_requested_revision(message_json)
+                await self.send_gpio_snapshot(since_revision, since_epoch)
+                await self.send_sequence_snapshot(since_revision, since_epoch)
             elif subject in ["heartbeat"]:
                 await self.dispatch_message("alive", "heartbeat", "remote")
             elif subject in ["terminal_command"]:
@@ -87,11 +91,49 @@ class MessagingQueueHandler:
         except Exception as e:
             logger.error(f"Error processing message: {e}. Message: {message_json}")
 
+    def get_requested_revision(self, message_json):
+        # A client that already holds a state sends back the {"epoch": E, "revision": N} it was sent, to get only
+        # what changed after N. A revision of another epoch (from before a restart) gets the full snapshot
+        body = message_json.get("body")
+        if isinstance(body, dict):
+            return body.get("revision"), body.get("epoch")
+        return None, None
+
+    async def send_state_delta(self, base_revision, changes, subject):
+        delta = {"base_revision": base_revision, "changes": changes}
+        await self.dispatch_message(delta, subject, "remote", revision=self.state.revision)
+
     async def send_gpio_state(self):
-        await self.dispatch_message(self.mygpio_handler.get_gpio_status(), "gpio_state", "remote")
+        """Publish the pins that changed since the last publish."""
+        base_revision = self.state.revision
+        changes = self.state.update("gpios", {gpio["pin"]: gpio for gpio in self.mygpio_handler.get_gpio_status()})
+        if changes:
+            await self.send_state_delta(base_revision, list(changes.values()), "gpio_state_delta")
+
+    async def send_gpio_snapshot(self, since_revision=None, since_epoch=None):
+        """Publish all the pins, or only the pins changed after since_revision if the client sent a known revision."""
+        await self.send_gpio_state()
+        changes = self.state.changes_since("gpios", since_revision, since_epoch)
+        if changes is None:
+            await self.dispatch_message(list(self.state.get("gpios").values()), "gpio_state", "remote", revision=self.state.revision)
+        else:
+            await self.send_state_delta(since_revision, list(changes.values()), "gpio_state_delta")
 
     async def send_sequence_state(self):
-        await self.dispatch_message(self.sequence_handler.get_state(), "sequence_state", "remote")
+        """Publish the sequence state fields that changed since the last publish."""
+        base_revision = self.state.revision
+        changes = self.state.update("sequence", self.sequence_handler.get_state())
+        if changes:
+            await self.send_state_delta(base_revision, changes, "sequence_state_delta")
+
+    async def send_sequence_snapshot(self, since_revision=None, since_epoch=None):
+        """Publish the whole sequence state, or only the fields changed after since_revision if the client sent a known revision."""
+        await self.send_sequence_state()
+        changes = self.state.changes_since("sequence", since_revision, since_epoch)
+        if changes is None:
+            await self.dispatch_message(self.state.get("sequence"), "sequence_state", "remote", revision=self.state.revision)
+        else:
+            await self.send_state_delta(since_revision, changes, "sequence_state_delta")
 
     async def send_playing_time(self):
         await self.dispatch_message(self.sequence_handler.get_playing_time(), "playing_time", "remote")
@@ -99,7 +141,7 @@ class MessagingQueueHandler:
     async def send_sequence(self, sequence="main"):
         await self.dispatch_message(self.sequence_handler.get_sequence(sequence), "sequence", "remote")
 
-    async def dispatch_message(self, message_body, subject, recipient, reply_subject=None):
+    async def dispatch_message(self, message_body, subject, recipient, reply_subject=None, revision=None):
         # Only send message if mqueue_sender is available (NATS is enabled)
         if self.mqueue_sender is None:
             logger.debug(f"NATS disabled - not sending message. Subject: {subject}, Recipient: {recipient}")
@@ -110,4 +152,7 @@ class MessagingQueueHandler:
             "subject": subject,
             "source": settings.mQueueClientID,
         }
+        if revision is not None:
+            message["epoch"] = self.state.epoch
+            message["revision"] = revision
         await self.mqueue_sender.send(message, recipient, reply_subject)
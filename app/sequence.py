@@ -4,18 +4,20 @@ import atexit
 import threading
 import random
 import os
+from concurrent.futures import ThreadPoolExecutor
 from os import path
 
 from dunebugger_settings import settings
 from dunebugger_logging import logger
-from utils import validate_path
+from sequence_compiler import SequenceCompiler, seek_plan
+from clock import MonotonicClock
 
 
 class SequencesHandler:
 
     lastTimeMark = 0
 
-    def __init__(self, mygpio_handler, GPIO, audio_handler, state_tracker, motor_handler, dmx_handler):
+    def __init__(self, mygpio_handler, GPIO, audio_handler, state_tracker, motor_handler, dmx_handler, clock=None, rng=None):
         self.sequenceFolder = path.join(path.dirname(path.abspath(__file__)), f"/opt/dunebugger-data/sequences/{settings.sequenceFolder}")
         self.random_elements = {}
         self.random_elements_file = settings.randomElementsFile
@@ -23,10 +25,19 @@ class SequencesHandler:
         self.standby_file = settings.standbyFile
         self.off_file = settings.offFile
         self.sequences_validated = False
-        self.cycle_thread_lock = threading.Lock()
-        self.cycle_event = threading.Event()
-        self.cycle_event.set()
-        self.cycle_stop_event = threading.Event()
+        # Cycles run as tasks on the main event loop; the lock queues a press made while a cycle is playing
+        self.loop = None
+        self.cycle_tasks = set()
+        self.cycle_lock = asyncio.Lock()
+        self.cycle_running = False
+        self.cycle_stop_requested = False
+        self.cycle_wakeup_event = asyncio.Event()
+        # Start button presses are debounced by the GPIO handler, then admitted according to startButtonPolicy
+        self.start_button_cooldown_until = 0
+        self.trigger_stats = {"presses": 0, "admitted": 0, "dropped": 0}
+        self.trigger_latencies = []
+        self.trigger_queue_waits = []
+        self.cycle_paused_at = None
         self.state_tracker = state_tracker
         self.mygpio_handler = mygpio_handler
         self.audio_handler = audio_handler
@@ -34,11 +45,19 @@ class SequencesHandler:
         self.dmx_handler = dmx_handler
         self.GPIO = GPIO
         self.start_button_enabled = False
-        self.cycle_playing_time = 0
-        self.cycle_time_thread = None
-        self.cycle_time_thread_stop_event = threading.Event()
-        self.cycle_offset = 0
-        self.mQueueCyclePlayingResolutionSecs = int(settings.mQueueCyclePlayingResolutionSecs)
+        self.main_sequence_playing = False
+        self.random_actions_timer = None
+        # Playback and timers run on self.clock: a VirtualClock makes whole-show dry runs take milliseconds
+        self.clock = clock if clock is not None else MonotonicClock()
+        self.rng = rng if rng is not None else random.Random()
+        self.event_log = None
+        # Blocking output calls run on one worker per executor, so they keep their order without stalling the loop
+        self.hardware_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="_hardware")
+        self.audio_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="_audio")
+        self.pending_outputs = []
+        self.sequence_start_time = None
+        self.cue_lateness = []
+        self.sequence_compiler = SequenceCompiler(mygpio_handler, audio_handler, dmx_handler)
 
         atexit.register(self.sequence_clean)
         try:
@@ -46,74 +65,6 @@ class SequencesHandler:
         except Exception as e:
             logger.error(f"Initial sequence validation error: {str(e)}")
 
-    def update_cycle_time(self):
-        while not self.cycle_time_thread_stop_event.is_set():
-            time.sleep(self.mQueueCyclePlayingResolutionSecs)
-            self.cycle_playing_time += self.mQueueCyclePlayingResolutionSecs
-            self.state_tracker.notify_update("playing_time")
-            if random.random() < 0.01:
-                logger.debug(f"Cycle playing time: {self.cycle_playing_time} seconds")
-
-    def start_cycle_time_thread(self):
-        """Start a thread to update the cycle playing time."""
-        self.cycle_playing_time = 0  # Reset playing time
-        self.cycle_time_thread_stop_event.clear()
-        self.cycle_time_thread = threading.Thread(target=self.update_cycle_time, daemon=True)
-        self.cycle_time_thread.start()
-
-    def stop_cycle_time_thread(self):
-        """Stop the cycle time thread."""
-        if self.cycle_time_thread:
-            self.cycle_time_thread_stop_event.set()
-            self.cycle_time_thread.join()
-            self.cycle_time_thread = None
-            self.cycle_playing_time = 0  # Reset playing time
-            self.state_tracker.notify_update("playing_time")
-
-    def validate_timestamps_order(self, file_path):
-        try:
-            timestamps = []
-            with open(file_path) as file:
-                for line_num, line in enumerate(file, start=1):
-                    command_line = line.strip()
-
-                    # Remove everything after #, treating it as a comment
-                    command_line = command_line.split("#", 1)[0].strip()
-                    command_line = command_line.split("//", 1)[0].strip()
-
-                    if not command_line:
-                        # If the line is empty after removing the comment, skip it
-                        continue
-
-                    time_mark_seconds, command_body = self.extract_time_mark(command_line)
-                    if time_mark_seconds is not None:
-                        try:
-                            # Convert time_mark_seconds to int if it's a string
-                            if isinstance(time_mark_seconds, str):
-                                time_mark_seconds = int(time_mark_seconds)
-                            timestamps.append((time_mark_seconds, line_num))
-                        except ValueError:
-                            raise ValueError(f"Invalid format at line {line_num}: {time_mark_seconds}")
-                    else:
-                        raise ValueError(f"Missing or invalid timestamp at line {line_num}")
-
-            # Check if timestamps are in consecutive order
-            for i in range(1, len(timestamps)):
-                current_time, current_line = timestamps[i]
-                previous_time, previous_line = timestamps[i-1]
-                
-                if current_time < previous_time:
-                    raise ValueError(f"Line {current_line} has timestamp {current_time}s which is less than "
-                               f"line {previous_line} timestamp {previous_time}s")
-
-            logger.debug(f"Timestamp validation passed for {file_path}")
-            return True
-
-        except FileNotFoundError:
-            raise FileNotFoundError(f"File not found during timestamp validation: {file_path}")
-        except Exception as e:
-            raise RuntimeError(f"Error validating timestamps in {file_path}: {e}")
-
     def set_sequences_validated(self, validation_result: bool):
         if isinstance(validation_result, bool):
             if self.sequences_validated != validation_result:
@@ -123,12 +74,9 @@ class SequencesHandler:
             return validation_result
 
     def validate_single_sequence_file(self, file_path):
-        # First validate syntax by doing a dry run
-        self.read_sequence_file(file_path, dry_run=True)
-        
-        # Then validate timestamp order
-        self.validate_timestamps_order(file_path)
-        return True
+        # Syntax, timestamp order and asset references are checked in one pass, results are cached by content
+        _, checked = self.sequence_compiler.validate(file_path)
+        return checked
 
     def validate_all_sequence_files(self, directory):
         try:
@@ -149,14 +97,19 @@ class SequencesHandler:
             if missing_files:
                 raise FileNotFoundError(f"Missing required sequence files in {directory}: {', '.join(missing_files)}")
             
-            # Then validate all .seq files for syntax and timestamp order
+            # Then validate all .seq files for syntax, timestamp order and assets. Unchanged files are not checked again
+            checked_files = 0
+            cached_files = 0
             for filename in os.listdir(directory):
                 if filename.endswith(".seq"):
                     file_path = os.path.join(directory, filename)
                     logger.debug(f"Validating sequence {file_path}")
-                    self.validate_single_sequence_file(file_path)
+                    if self.validate_single_sequence_file(file_path):
+                        checked_files += 1
+                    else:
+                        cached_files += 1
 
-            logger.info(f"All sequence files validated successfully in {directory}")
+            logger.info(f"All sequence files validated successfully in {directory} ({checked_files} checked, {cached_files} unchanged)")
             return True
             
         except OSError as e:
@@ -173,34 +126,34 @@ class SequencesHandler:
         if motor_enabled:
             self.motor_handler.start(motor_number, direction, speed)
 
-    def execute_dmx_command(self, dmx_command, channel, scene_or_value, duration=2.0):
+    def execute_dmx_command(self, dmx_command, channel, scene_or_value, duration=2.0, curve="linear"):
         if not settings.dmxEnabled:
             raise ValueError("DMX module is disabled")
         else:
-            if self.dmx_handler.serial_conn is None:
+            if not self.dmx_handler.is_connected():
                 raise ConnectionError("DMX module is not connected")
         
         if dmx_command == "fade":
-            self.dmx_handler.fade_to_scene(scene_or_value, channel, duration)
+            self.dmx_handler.fade_to_scene(scene_or_value, channel, duration, curve)
         elif dmx_command == "set":
             self.dmx_handler.set_scene(scene_or_value, channel)
         elif dmx_command == "dimmer":
             self.dmx_handler.set_dimmer(scene_or_value, channel)
         elif dmx_command == "fade_dimmer":
-            self.dmx_handler.fade_to_dimmer(scene_or_value, channel, duration)
+            self.dmx_handler.fade_to_dimmer(scene_or_value, channel, duration, curve)
+        elif dmx_command == "cue":
+            # channel is the cue list, scene_or_value the cue
+            self.dmx_handler.go_cue(scene_or_value, channel)
+        elif dmx_command == "cue_look":
+            self.dmx_handler.go_cue(scene_or_value, channel, crossfade=False)
         else:
             raise ValueError(f"Unknown DMX command: {dmx_command}")
 
-    def execute_switch_command(self, device_name, action):
-        if action.lower() == "on" or action.lower() == "off":
-            # Warning: on GPIO the action is inverted: on = 0, off = 1
-            gpio_value = 0 if action.lower() == "on" else 1
-            self.mygpio_handler.gpio_set_output(device_name, gpio_value)
-        else:
-            logger.error(f"Unknown action: {action}")
+    def execute_switch_command(self, device_name, gpio_value):
+        self.mygpio_handler.gpio_set_output(device_name, gpio_value)
 
-    def execute_waituntil_command(self, duration):
-        self.waituntil(duration)
+    async def execute_waituntil_command(self, duration):
+        await self.waituntil(duration)
 
     def execute_audio_fadeout_command(self, fadeout_secs):
         self.audio_handler.vstopaudio(fadeout_secs)
@@ -214,156 +167,125 @@ class SequencesHandler:
     def execute_play_sfx_command(self, music_folder):
         self.audio_handler.play_sfx(music_folder)
 
-    def execute_command(self, command_body, dry_run=False):
-        parts = command_body.split()
-
-        verb = parts[0].lower()
-        # TODO: motor stop
-        if verb == "motor" and settings.motorEnabled:
-            if parts[1].lower() == "start":
-                motor_number = int(parts[2])
-                direction = parts[3].lower()
-                speed = int(parts[4])
-
-                # Validate motor number
-                if not isinstance(motor_number, int) or motor_number < 1 :
-                    raise ValueError(f"Invalid motor number: {motor_number}")
-
-                # Validate direction
-                if direction not in ["ccw", "cw"]:
-                    raise ValueError(f"Invalid motor direction: {direction}")
-                # Validate speed
-                if  not isinstance(speed, int) or speed < 1:
-                    raise ValueError(f"Invalid motor speed: {speed}")
-                    
-                if not dry_run:
-                    self.execute_motor_command(motor_number, direction, speed)
-                        
-        else:
-            # Verify switch command
-            if verb == "switch":
-                device_name = parts[1]
-                action = parts[2].lower()
-
-                # Validate device name
-                if device_name not in self.mygpio_handler.GPIOMap:
-                    raise ValueError(f"Invalid device name: {device_name}")
-
-                # Validate action
-                if action not in ["on", "off"]:
-                    raise ValueError(f"Invalid action: {action}. Action must be 'on' or 'off'.")
-                if not dry_run:
-                    self.execute_switch_command(device_name, action)
-
-            elif verb == "audio" and len(parts) >= 2:
-                action = parts[1].lower()
-                parameter = parts[2].lower()
-
-                if action == "fadeout":
-                    fadeout_secs = int(parameter)
-                    if  not isinstance(fadeout_secs, int) or fadeout_secs < 0:
-                        raise ValueError(f"Invalid fadeout seconds: {fadeout_secs}")
-                    if not dry_run:
-                        self.execute_audio_fadeout_command(fadeout_secs)
-
-                elif action == "playmusic":
-                    music_folder = self.audio_handler.get_music_path(parameter)
-                    if not validate_path(music_folder):
-                        raise ValueError(f"Music folder {music_folder} does not exist")
-                    else:
-                        if not dry_run:
-                            self.execute_playmusic_command(music_folder)
-                            
-                elif action == "playsfx":
-                    sfx_file = self.audio_handler.get_sfx_filepath(parameter)
-                    if not validate_path(sfx_file):
-                        raise ValueError(f"Sfx file {sfx_file} does not exist")
-                    else:
-                        if not dry_run:
-                            self.execute_play_sfx_command(sfx_file)
-                else:
-                    raise ValueError(f"Unknown audio action: {action}")
-
-            #TODO: revisit the command interpreter vs sequence parser. Refactor to avoid code duplication.
-            elif verb == "dmx":
-                parsed_dmx_command_args = self.dmx_handler.validate_dmx_command_args(parts[1:])
-                if isinstance(parsed_dmx_command_args, str):
-                    raise ValueError(parsed_dmx_command_args)
-                _, dmx_command, channel, scene_or_value, duration = parsed_dmx_command_args
-
-                if not dry_run:
-                    try:
-                        self.execute_dmx_command(dmx_command, channel, scene_or_value, duration)
-                        if dmx_command in ["fade", "fade_dimmer"]:
-                            logger.debug(f"DMX command '{dmx_command}' executed on channel {channel} with value '{scene_or_value}' over {duration}s")
-                        else:
-                            logger.debug(f"DMX command '{dmx_command}' executed on channel {channel} with value '{scene_or_value}'")
-                    except Exception as e:
-                        logger.error(f"Error executing DMX command: {e}")
-                else:
-                    if not settings.dmxEnabled:
-                        logger.warning("DMX module is disabled")
-                    else:
-                        if self.dmx_handler.serial_conn is None:
-                            logger.warning("DMX module is not connected")
-                        
-            else:
-                raise ValueError(f"Unknown command: {command_body}")
-
-        return True
-
-    def read_sequence_file(self, file_path, dry_run=False):
-        try:
-            with open(file_path) as file:
-                for line_num, line in enumerate(file, start=1):
-                    command_line = line.strip()
-
-                    # Remove everything after #, treating it as a comment
-                    command_line = command_line.split("#", 1)[0].strip()
-                    command_line = command_line.split("//", 1)[0].strip()
-
-                    if not command_line:
-                        # If the line is empty after removing the comment, skip it
-                        continue
-
-                    time_mark_seconds, command_body = self.extract_time_mark(command_line)
-                    if not dry_run:
-                        self.execute_waituntil_command(int(time_mark_seconds))
-                    # check for stop signal
-                    if self.cycle_stop_event.is_set():
-                        self.cycle_stop_event.clear()
-                        break
-                    self.execute_command(command_body, dry_run)
-
-        except FileNotFoundError:
-           raise FileNotFoundError(f"File not found: {file_path}")
-        except Exception as e:
-            raise RuntimeError(f"Error reading sequence file {file_path} line {line_num}: {e}")
-
-
-    def extract_time_mark(self, command):
-        parts = command.split(" ", 1)
-        if len(parts) == 2:
-            time_mark = parts[0].strip()
-            command_body = parts[1].strip()
-            if ":" in time_mark:
-                # Check if the time mark contains hours, minutes, and seconds
-                time_components = time_mark.split(":")
-                if len(time_components) == 3:
-                    # Convert HH:MM:SS format to seconds
-                    hours, minutes, seconds = map(int, time_components)
-                    time_mark_seconds = hours * 3600 + minutes * 60 + seconds
-                elif len(time_components) == 2:
-                    # Convert MM:SS format to seconds
-                    minutes, seconds = map(int, time_components)
-                    time_mark_seconds = minutes * 60 + seconds
+    def log_event(self, description):
+        if self.event_log is not None:
+            self.event_log.append((round(self.clock.monotonic(), 6), description))
+
+    def execute_event(self, event):
+        verb = event.verb
+        if verb == "switch":
+            device_name, _, gpio_value = event.args
+            self.execute_switch_command(device_name, gpio_value)
+        elif verb == "motor":
+            self.execute_motor_command(*event.args)
+        elif verb == "audio":
+            if event.action == "fadeout":
+                self.execute_audio_fadeout_command(*event.args)
+            elif event.action == "playmusic":
+                self.execute_playmusic_command(*event.args)
+            elif event.action == "playsfx":
+                self.execute_play_sfx_command(*event.args)
+        elif verb == "dmx":
+            dmx_command, channel, scene_or_value, duration, curve = event.args
+            try:
+                self.execute_dmx_command(dmx_command, channel, scene_or_value, duration, curve)
+                if dmx_command in ["fade", "fade_dimmer"]:
+                    logger.debug(f"DMX command '{dmx_command}' executed on channel {channel} with value '{scene_or_value}' over {duration}s")
                 else:
-                    raise ValueError("Invalid time format")
-                return time_mark_seconds, command_body
-            else:
-                return time_mark, command_body
-
-        raise ValueError("Invalid command format")
+                    logger.debug(f"DMX command '{dmx_command}' executed on channel {channel} with value '{scene_or_value}'")
+            except Exception as e:
+                logger.error(f"Error executing DMX command: {e}")
+
+    def execute_dmx_events(self, dmx_events):
+        # All the DMX commands of a frame go out as a single DMX frame
+        with self.dmx_handler.batch():
+            for event in dmx_events:
+                self.execute_event(event)
+
+    def execute_hardware_frame(self, frame):
+        if frame.switches:
+            self.mygpio_handler.gpio_write_outputs(dict(frame.switches))
+        if frame.dmx:
+            self.execute_dmx_events(frame.dmx)
+        for event in frame.others:
+            if event.verb != "audio":
+                self.execute_event(event)
+
+    def execute_audio_frame(self, frame):
+        for event in frame.others:
+            if event.verb == "audio":
+                self.execute_event(event)
+
+    def submit_output(self, description, executor, func, *args):
+        future = self.clock.run_blocking(executor, func, *args)
+        self.pending_outputs.append(future)
+        future.add_done_callback(lambda done: self.output_done(done, description))
+        return future
+
+    def output_done(self, future, description):
+        if future in self.pending_outputs:
+            self.pending_outputs.remove(future)
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Error executing {description}: {future.exception()}")
+
+    async def drain_outputs(self):
+        """Wait for the outputs handed to the executors so far."""
+        if self.pending_outputs:
+            await asyncio.gather(*list(self.pending_outputs), return_exceptions=True)
+
+    def execute_frame(self, frame, description):
+        # Hand the frame to the executors without waiting: a slow call (e.g. an audio fadeout) doesn't delay
+        # the next cue, and each executor still runs the frames in order
+        for event in frame.events:
+            self.log_event(event.source)
+        if frame.switches or frame.dmx or any(event.verb != "audio" for event in frame.others):
+            self.submit_output(description, self.hardware_executor, self.execute_hardware_frame, frame)
+        if any(event.verb == "audio" for event in frame.others):
+            self.submit_output(description, self.audio_executor, self.execute_audio_frame, frame)
+
+    def apply_snapshot_outputs(self, snapshot):
+        if snapshot.switches:
+            self.mygpio_handler.gpio_write_outputs(dict(snapshot.switches))
+        with self.dmx_handler.batch():
+            for dmx_command, channel, scene_or_value in snapshot.dmx:
+                try:
+                    self.execute_dmx_command(dmx_command, channel, scene_or_value)
+                except Exception as e:
+                    logger.error(f"Error executing DMX command: {e}")
+
+    def apply_snapshot(self, snapshot, description):
+        """Bring the outputs to a precomputed timeline state without replaying the events before it."""
+        self.log_event(f"snapshot at {snapshot.time}s")
+        self.submit_output(description, self.hardware_executor, self.apply_snapshot_outputs, snapshot)
+        if snapshot.music is not None:
+            self.submit_output(description, self.audio_executor, self.execute_playmusic_command, snapshot.music)
+
+    async def play_sequence_file(self, file_path, start_offset=0):
+        plan = self.sequence_compiler.get_plan(file_path)
+        frames = plan.frames
+        # Cue steps (dmx cue next/prev) of a sequence count from its start, whatever the last run left.
+        # Queued on the hardware executor, after the DMX commands still pending
+        self.submit_output(f"sequence file {file_path} cue lists rewind", self.hardware_executor, self.dmx_handler.reset_cue_lists)
+        if start_offset > 0:
+            snapshot, frame_index = seek_plan(plan, start_offset)
+            if snapshot is not None:
+                logger.debug(f"Applying snapshot at {snapshot.time}s of {path.basename(file_path)}")
+                self.apply_snapshot(snapshot, f"sequence file {file_path} snapshot at {snapshot.time}s")
+            frames = plan.frames[frame_index:]
+        self.sequence_start_time = self.clock.monotonic() - start_offset * settings.cyclespeed
+        self.cue_lateness = []
+        for frame in frames:
+            await self.execute_waituntil_command(frame.time)
+            # check for stop signal
+            if self.cycle_stop_requested:
+                self.cycle_stop_requested = False
+                break
+            self.execute_frame(frame, f"sequence file {file_path} line {frame.events[0].line_num}")
+        await self.drain_outputs()
+
+        if self.cue_lateness:
+            lateness_stats = self.get_cue_lateness_stats()
+            logger.debug(f"Sequence {path.basename(file_path)}: {lateness_stats['cues']} cues, max lateness {lateness_stats['max_lateness'] * 1000:.1f}ms, mean lateness {lateness_stats['mean_lateness'] * 1000:.1f}ms")
 
     def random_sequence_from_file(self, file_name):
         try:
@@ -376,25 +298,34 @@ class SequencesHandler:
             raise RuntimeError(f"Error reading random elements file {file_path}: {e}")
 
     def random_action(self):
-        rand_elem = random.choice(self.random_elements)
-        self.mygpio_handler.gpiomap_toggle_output(rand_elem)
+        rand_elem = self.rng.choice(self.random_elements)
+        self.log_event(f"random toggle {rand_elem}")
+        self.submit_output(f"random action on {rand_elem}", self.hardware_executor, self.mygpio_handler.gpiomap_toggle_output, rand_elem)
 
-    def random_actions(self):
-        while not self.random_actions_event.is_set():
-            self.random_actions_event.wait(timeout=random.uniform(settings.randomActionsMinSecs, settings.randomActionsMaxSecs))
-            self.random_action()
+    def random_actions(self, random_actions_event):
+        # Each random action schedules the next one on the clock, until random actions are disabled
+        if random_actions_event.is_set():
+            return
+        self.random_action()
+        self.schedule_random_action(random_actions_event)
+
+    def schedule_random_action(self, random_actions_event):
+        delay = self.rng.uniform(settings.randomActionsMinSecs, settings.randomActionsMaxSecs)
+        self.random_actions_timer = self.clock.call_later(delay, lambda: self.random_actions(random_actions_event))
 
     def enable_random_actions(self):
         self.random_sequence_from_file(self.random_elements_file)
+        self.disable_random_actions()
         self.random_actions_event = threading.Event()
-        self.random_actions_event.clear()
-        self.random_actions_thread = threading.Thread(name="_random_actions", target=self.random_actions, daemon=True)
-        self.random_actions_thread.start()
+        self.schedule_random_action(self.random_actions_event)
         self.state_tracker.notify_update("random_actions")
 
     def disable_random_actions(self):
         if hasattr(self, "random_actions_event"):
             self.random_actions_event.set()
+            if self.random_actions_timer is not None:
+                self.random_actions_timer.cancel()
+                self.random_actions_timer = None
             self.state_tracker.notify_update("random_actions")
 
     def get_random_actions_state(self):
@@ -409,34 +340,76 @@ class SequencesHandler:
         else:
             self.disable_random_actions()
 
-    def setStandByMode(self):
+    async def setStandByMode(self):
         file_path = os.path.join(self.sequenceFolder, self.standby_file)
-        self.read_sequence_file(file_path)
+        await self.play_sequence_file(file_path)
 
-    def setOffMode(self):
+    async def setOffMode(self):
         file_path = os.path.join(self.sequenceFolder, self.off_file)
-        self.read_sequence_file(file_path)
+        await self.play_sequence_file(file_path)
 
-    def start(self):
+    async def start(self, start_offset=0):
         file_path = os.path.join(self.sequenceFolder, self.sequence_file)
-        self.read_sequence_file(file_path)
+        # The playing time is computed from the main sequence start, clients are notified only when it starts, pauses, resumes or ends
+        self.main_sequence_playing = True
+        self.state_tracker.notify_update("playing_time")
+        try:
+            await self.play_sequence_file(file_path, start_offset)
+        finally:
+            self.main_sequence_playing = False
+            self.state_tracker.notify_update("playing_time")
 
-    def waituntil(self, sec):
-        logger.debug("Waiting: " + str(sec - self.cycle_offset))
-        self.cycle_event.wait((sec - self.cycle_offset) * settings.cyclespeed)
-        self.cycle_offset = sec
+    def get_sequence_duration(self):
+        file_path = os.path.join(self.sequenceFolder, self.sequence_file)
+        return self.sequence_compiler.get_plan(file_path).duration
+
+    async def waituntil(self, sec):
+        # Deadlines are absolute from the sequence start, so slow commands don't push later cues back.
+        # Stop, pause and resume set cycle_wakeup_event to interrupt the wait immediately.
+        while self.cycle_running and not self.cycle_stop_requested:
+            if self.cycle_paused_at is not None:
+                await self.clock.wait(self.cycle_wakeup_event)
+                self.cycle_wakeup_event.clear()
+                continue
+            deadline = self.sequence_start_time + sec * settings.cyclespeed
+            remaining = deadline - self.clock.monotonic()
+            if remaining <= 0:
+                self.cue_lateness.append((sec, -remaining))
+                break
+            logger.debug(f"Waiting: {remaining:.3f}")
+            await self.clock.wait(self.cycle_wakeup_event, remaining)
+            self.cycle_wakeup_event.clear()
+
+    def get_elapsed_time(self):
+        """Seconds of sequence timeline played so far, excluding paused time."""
+        if self.sequence_start_time is None or not self.cycle_running:
+            return 0
+        now = self.cycle_paused_at if self.cycle_paused_at is not None else self.clock.monotonic()
+        return (now - self.sequence_start_time) / settings.cyclespeed
+
+    def get_cue_lateness_stats(self):
+        if not self.cue_lateness:
+            return {"cues": 0, "max_lateness": 0.0, "mean_lateness": 0.0}
+        latenesses = [lateness for _, lateness in self.cue_lateness]
+        return {
+            "cues": len(latenesses),
+            "max_lateness": max(latenesses),
+            "mean_lateness": sum(latenesses) / len(latenesses),
+        }
 
     def sequence_clean(self):
         logger.debug("Sequence clean")
         self.disable_start_button()
 
     def enable_start_button(self):
-        self.mygpio_handler.addEventDetect(settings.startButtonGPIOName, lambda channel: self.cycle_trigger(channel))
+        if self.start_button_enabled:
+            return
+        self.mygpio_handler.subscribe_input(settings.startButtonGPIOName, self.start_button_pressed, settings.bouncingTreshold)
         self.start_button_enabled = True
         self.state_tracker.notify_update("start_button")
 
     def disable_start_button(self):
-        self.mygpio_handler.removeEventDetect(settings.startButtonGPIOName)
+        self.mygpio_handler.unsubscribe_input(settings.startButtonGPIOName)
         self.start_button_enabled = False
         self.state_tracker.notify_update("start_button")
 
@@ -444,56 +417,211 @@ class SequencesHandler:
         return self.start_button_enabled
 
     def cycle_stop(self):
-        self.cycle_stop_event.set()
-
-    def cycle_trigger(self, channel=False):
-        with self.cycle_thread_lock:
-            # Check if sequences are validated before starting cycle
-            if not self.sequences_validated:
-                logger.error("Cannot start cycle: sequence files are not properly validated. Please check sequence files configuration.")
-                return
-            
-            if channel is not False:
-                # TODO : fix bouncing
-                # start_time = time.time()
-                # while time.time() < start_time + settings.bouncingTreshold:
-                time.sleep(settings.bouncingTreshold)  # avoid catching a bouncing
-                if self.GPIO.input(channel) != 1:
-                    logger.debug("Warning! Cycle: below treshold of " + str(settings.bouncingTreshold) + " on channel" + str(channel))
-                    return
+        if not self.get_cycle_state():
+            return False
+        if self.cycle_paused_at is not None:
+            # Stopping a paused cycle leaves the outputs as stopping a running one does
+            self.submit_output("cycle stop", self.audio_executor, self.audio_handler.resume_audio)
+            self.submit_output("cycle stop", self.hardware_executor, self.dmx_handler.resume)
+        self.cycle_paused_at = None
+        self.cycle_stop_requested = True
+        self.wake_cycle()
+        return True
 
-            logger.info("Start button pressed")
-            threading.Thread(name="_cycle_thread", target=self.cycle, daemon=True).start()
+    def cycle_pause(self):
+        if not self.get_cycle_state() or self.cycle_paused_at is not None:
+            return False
+        self.cycle_paused_at = self.clock.monotonic()
+        self.wake_cycle()
+        # Music and DMX fades hold with the timeline, after the outputs already handed to their executor.
+        # Motors are not paused: they have no position to resume from
+        self.submit_output("cycle pause", self.audio_executor, self.audio_handler.pause_audio)
+        self.submit_output("cycle pause", self.hardware_executor, self.dmx_handler.pause)
+        logger.info(f"Cycle paused at {self.get_elapsed_time():.1f}s")
+        self.state_tracker.notify_update("cycle_start_stop")
+        self.state_tracker.notify_update("playing_time")
+        return True
 
-    def get_cycle_state(self):
-        if self.cycle_event.is_set():
+    def cycle_resume(self):
+        if self.cycle_paused_at is None:
             return False
+        # Shift the sequence start by the paused time, so the timeline continues from the same point
+        self.sequence_start_time += self.clock.monotonic() - self.cycle_paused_at
+        self.cycle_paused_at = None
+        self.wake_cycle()
+        self.submit_output("cycle resume", self.audio_executor, self.audio_handler.resume_audio)
+        self.submit_output("cycle resume", self.hardware_executor, self.dmx_handler.resume)
+        logger.info(f"Cycle resumed at {self.get_elapsed_time():.1f}s")
+        self.state_tracker.notify_update("cycle_start_stop")
+        self.state_tracker.notify_update("playing_time")
         return True
 
-    def cycle(self):
-        with self.cycle_thread_lock:
-            self.cycle_event.clear()
-            self.cycle_stop_event.clear()
-            self.save_random_actions_state = self.get_random_actions_state()
-            self.disable_random_actions()
-            self.start_cycle_time_thread()
-            self.start()
-            self.stop_cycle_time_thread()
-            self.restore_random_actions_state(self.save_random_actions_state)
-            self.cycle_offset = 0
-            self.setStandByMode()
-            self.cycle_event.set()
+    def get_cycle_paused_state(self):
+        return self.cycle_paused_at is not None
+
+    async def start_cycle_runner(self):
+        """Bind the cycle runner to the running event loop. Start button presses are handed over to it."""
+        self.loop = asyncio.get_running_loop()
+
+    async def stop_cycle_runner(self):
+        for task in list(self.cycle_tasks):
+            task.cancel()
+        await asyncio.gather(*self.cycle_tasks, return_exceptions=True)
+        self.disable_random_actions()
+        self.hardware_executor.shutdown(wait=False, cancel_futures=True)
+        self.audio_executor.shutdown(wait=False, cancel_futures=True)
+        self.loop = None
+
+    def in_loop(self):
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def call_in_loop(self, callback, *args):
+        """Run callback on the cycle runner loop, from whichever thread (e.g. GPIO edge callbacks)."""
+        if self.in_loop():
+            callback(*args)
+        elif self.loop is not None:
+            self.loop.call_soon_threadsafe(callback, *args)
+        else:
+            logger.error("Cycle runner is not started")
+
+    def wake_cycle(self):
+        self.call_in_loop(self.cycle_wakeup_event.set)
+
+    def start_cycle_task(self, start_offset=0, trigger_time=None):
+        task = asyncio.get_running_loop().create_task(self.cycle(start_offset, trigger_time), name="_cycle_task")
+        self.cycle_tasks.add(task)
+        task.add_done_callback(self.cycle_tasks.discard)
+
+    def start_button_pressed(self, input_event):
+        self.admit_start_button_press(input_event.edge_time)
+
+    def drop_press(self, reason):
+        self.trigger_stats["dropped"] += 1
+        logger.info(f"Start button press dropped: {reason}")
+
+    def admit_start_button_press(self, edge_time):
+        self.trigger_stats["presses"] += 1
+        if not self.sequences_validated:
+            logger.error("Cannot start cycle: sequence files are not properly validated. Please check sequence files configuration.")
+            self.drop_press("sequences not validated")
+            return
+        now = self.clock.monotonic()
+        if now < self.start_button_cooldown_until:
+            self.drop_press(f"cooldown ({self.start_button_cooldown_until - now:.1f}s left)")
+            return
+        if self.cycle_tasks:
+            if settings.startButtonPolicy == "ignore":
+                self.drop_press("cycle is running")
+                return
+            # queue and restart both keep at most one cycle waiting behind the running one
+            if len(self.cycle_tasks) > 1:
+                self.drop_press("a cycle is already queued")
+                return
+            if settings.startButtonPolicy == "restart":
+                logger.info("Start button pressed: restarting cycle")
+                self.cycle_stop()
+            else:
+                logger.info("Start button pressed: cycle queued")
+        else:
+            logger.info("Start button pressed")
+        self.trigger_stats["admitted"] += 1
+        self.start_button_cooldown_until = now + settings.startButtonCooldownSecs
+        self.start_cycle_task(0, edge_time)
+
+    def get_trigger_stats(self):
+        """Start button press counters and press-to-cycle-start latency, in seconds."""
+        stats = dict(self.trigger_stats)
+        input_stats = self.mygpio_handler.get_input_stats(settings.startButtonGPIOName) or {}
+        stats["bounces"] = input_stats.get("bounces", 0)
+        stats["glitches"] = input_stats.get("glitches", 0)
+        stats["last_latency"] = self.trigger_latencies[-1] if self.trigger_latencies else 0.0
+        stats["max_latency"] = max(self.trigger_latencies) if self.trigger_latencies else 0.0
+        stats["mean_latency"] = sum(self.trigger_latencies) / len(self.trigger_latencies) if self.trigger_latencies else 0.0
+        stats["max_queue_wait"] = max(self.trigger_queue_waits) if self.trigger_queue_waits else 0.0
+        return stats
+
+    def cycle_trigger(self, start_offset=0):
+        # Check if sequences are validated before starting cycle
+        if not self.sequences_validated:
+            logger.error("Cannot start cycle: sequence files are not properly validated. Please check sequence files configuration.")
+            return
+
+        logger.info("Cycle triggered")
+        self.call_in_loop(self.start_cycle_task, start_offset)
+
+    def cycle_seek(self, start_offset):
+        """Start a cycle at start_offset seconds of the main sequence."""
+        duration = self.get_sequence_duration()
+        if not 0 <= start_offset <= duration:
+            raise ValueError(f"Invalid start offset: {start_offset}s. Must be between 0 and {duration}s")
+        logger.info(f"Starting cycle at {start_offset}s")
+        self.cycle_trigger(start_offset=start_offset)
+
+    def get_cycle_state(self):
+        return self.cycle_running
+
+    async def cycle(self, start_offset=0, trigger_time=None):
+        requested_at = self.clock.monotonic()
+        if trigger_time is not None:
+            # How fast the trigger responds: up to the cycle being requested, whether it starts now or is queued.
+            # Keep a bounded history: one entry per admitted press
+            self.trigger_latencies = self.trigger_latencies[-99:] + [requested_at - trigger_time]
+        async with self.cycle_lock:
+            if trigger_time is not None:
+                # Time spent queued behind the running cycle (startButtonPolicy queue), 0 if it started at once
+                self.trigger_queue_waits = self.trigger_queue_waits[-99:] + [self.clock.monotonic() - requested_at]
+            self.cycle_running = True
+            self.cycle_stop_requested = False
+            self.cycle_paused_at = None
+            try:
+                self.save_random_actions_state = self.get_random_actions_state()
+                self.disable_random_actions()
+                self.state_tracker.notify_update("cycle_start_stop")
+                try:
+                    await self.start(start_offset)
+                except Exception as e:
+                    logger.error(f"Cycle error: {e}")
+                self.restore_random_actions_state(self.save_random_actions_state)
+                await self.setStandByMode()
+            finally:
+                self.cycle_running = False
+                self.state_tracker.notify_update("cycle_start_stop")
+                self.start_button_cooldown_until = max(self.start_button_cooldown_until, self.clock.monotonic() + settings.startButtonCooldownSecs)
 
     def get_state(self):
         return {
             "random_actions": self.get_random_actions_state(),
             "cycle_running": self.get_cycle_state(),
+            "cycle_paused": self.get_cycle_paused_state(),
             "start_button_enabled": self.get_start_button_state(),
             "sequences_validated": self.sequences_validated,
         }
 
     def get_playing_time(self):
-        return self.cycle_playing_time
+        """
+        Playing time of the main sequence, in seconds, with what a UI needs to interpolate it between updates:
+        while not paused, the playing time at wall clock time t is offset + (t - timestamp) / cyclespeed.
+        start_time is the wall clock time the sequence would have started at, had it not been paused or seeked.
+        """
+        now = time.time()
+        playing = self.main_sequence_playing and self.sequence_start_time is not None
+        offset = self.get_elapsed_time() if playing else 0
+        try:
+            duration = self.get_sequence_duration()
+        except Exception:
+            duration = None
+        return {
+            "playing": playing,
+            "paused": playing and self.get_cycle_paused_state(),
+            "offset": round(offset, 3),
+            "start_time": round(now - offset * settings.cyclespeed, 3) if playing else None,
+            "timestamp": round(now, 3),
+            "duration": duration,
+            "cyclespeed": settings.cyclespeed,
+        }
 
     def get_sequence(self, sequence_name):
         if sequence_name == "main":
@@ -517,27 +645,13 @@ class SequencesHandler:
 
     def _parse_sequence_file(self, file_path):
         sequence_data = []
-        with open(file_path) as file:
-            for line in file:
-                command_line = line.strip()
+        for line in self.sequence_compiler.get_lines(file_path):
+            parts = line.command_body.split()
+            command = parts[0]#.lower()
+            action = parts[1] if len(parts) > 1 else None #parts[1].lower() if len(parts) > 1 else None
+            parameter = " ".join(parts[2:]) if len(parts) > 2 else None
 
-                # Remove comments
-                command_line = command_line.split("#", 1)[0].strip()
-                command_line = command_line.split("//", 1)[0].strip()
-
-                if not command_line:
-                    continue
-
-                time_mark, command_body = self.extract_time_mark(command_line)
-                if time_mark is not None:
-                    parts = command_body.split()
-                    command = parts[0]#.lower()
-                    action = parts[1] if len(parts) > 1 else None #parts[1].lower() if len(parts) > 1 else None
-                    parameter = " ".join(parts[2:]) if len(parts) > 2 else None
-
-                    sequence_data.append({"time": time_mark, "command": command, "action": action, "parameter": parameter})
-                else:
-                    logger.error(f"Invalid time mark in sequence file: {file_path}")
+            sequence_data.append({"time": line.time_mark, "command": command, "action": action, "parameter": parameter})
         return sequence_data
 
     def upload_sequence_file(self, filename, file_content):
@@ -611,6 +725,7 @@ class SequencesHandler:
         finally:
             # Clean up temporary file
             try:
+                self.sequence_compiler.forget(temp_file_path)
                 os.unlink(temp_file_path)
-            except OSError:
+            except (OSError, NameError):
                 pass
@@ -0,0 +1,408 @@
+import bisect
+import hashlib
+import os
+from collections import namedtuple
+
+from dunebugger_settings import settings
+from dunebugger_logging import logger
+from dmx_cues import cue_index
+
+# A parsed (but not yet compiled) line of a .seq file. time_mark is kept as extract_time_mark returns it,
+# so get_sequence keeps reporting the time marks the way they were written.
+SequenceLine = namedtuple("SequenceLine", ["line_num", "time_mark", "command_body"])
+
+# A compiled, ready to execute command. args are already resolved for the verb:
+#   switch: (device_name, gpio, gpio_value)
+#   motor:  (motor_number, direction, speed)
+#   audio:  (fadeout_secs,) | (music_folder,) | (sfx_file,)
+#   dmx:    (dmx_command, channel, scene_or_value, duration, curve)
+SequenceEvent = namedtuple("SequenceEvent", ["time", "line_num", "verb", "action", "args", "source"])
+
+# All the events sharing a timestamp, applied together as one output frame:
+#   switches: ((gpio, gpio_value), ...) written as a single GPIO batch, GPIOs already resolved
+#   dmx:      DMX events, sent as a single DMX frame
+#   others:   audio and motor events, in file order
+SequenceFrame = namedtuple("SequenceFrame", ["time", "events", "switches", "dmx", "others"])
+
+SequencePlan = namedtuple("SequencePlan", ["digest", "lines", "events", "duration", "assets", "frames", "frame_times", "snapshots"])
+
+# Output state right after all the frames at or before time have been applied:
+#   switches: ((gpio, gpio_value), ...)
+#   dmx:      ((dmx_command, channel, scene_or_value), ...) to replay, fades already resolved to their target
+#             and cues to the look (cue_look) of the cue index reached
+#   music:    music folder playing at that time, None if no music or faded out
+SequenceSnapshot = namedtuple("SequenceSnapshot", ["time", "switches", "dmx", "music"])
+
+# A cached validation failure. assets holds (path, existed) for every asset referenced up to the failure,
+# so a failure caused by a missing music folder or sfx file is retried once the asset shows up.
+SequenceFailure = namedtuple("SequenceFailure", ["kind", "line_num", "detail", "assets"])
+
+
+def time_mark_to_seconds(time_mark):
+    if ":" in time_mark:
+        # Check if the time mark contains hours, minutes, and seconds
+        time_components = time_mark.split(":")
+        if len(time_components) == 3:
+            # Convert HH:MM:SS format to seconds
+            hours, minutes, seconds = map(int, time_components)
+            return hours * 3600 + minutes * 60 + seconds
+        elif len(time_components) == 2:
+            # Convert MM:SS format to seconds
+            minutes, seconds = map(int, time_components)
+            return minutes * 60 + seconds
+        else:
+            raise ValueError("Invalid time format")
+    return int(time_mark)
+
+
+def extract_time_mark(command):
+    parts = command.split(" ", 1)
+    if len(parts) == 2:
+        time_mark = parts[0].strip()
+        command_body = parts[1].strip()
+        if ":" in time_mark:
+            return time_mark_to_seconds(time_mark), command_body
+        else:
+            return time_mark, command_body
+
+    raise ValueError("Invalid command format")
+
+
+def build_frames(events):
+    """Group the events sharing a timestamp into frames."""
+    frames = []
+    index = 0
+    while index < len(events):
+        frame_time = events[index].time
+        frame_events = []
+        while index < len(events) and events[index].time == frame_time:
+            frame_events.append(events[index])
+            index += 1
+
+        switches = {}
+        for event in frame_events:
+            if event.verb == "switch":
+                _, gpio, gpio_value = event.args
+                # The last line for a device wins, as when lines were applied one by one
+                switches.pop(gpio, None)
+                switches[gpio] = gpio_value
+        dmx = tuple(event for event in frame_events if event.verb == "dmx")
+        others = tuple(event for event in frame_events if event.verb not in ["switch", "dmx"])
+        frames.append(SequenceFrame(frame_time, tuple(frame_events), tuple(switches.items()), dmx, others))
+    return tuple(frames)
+
+
+def build_snapshots(frames, cue_lists=None):
+    """
+    Precompute the output state after each frame of a timeline. cue_lists maps each cue list to its
+    cue names, to resolve next and prev: cue lists are rewound when a sequence starts.
+    """
+    cue_lists = cue_lists or {}
+    snapshots = []
+    switches = {}
+    dmx = {}
+    cue_positions = {}
+    music = None
+    for frame in frames:
+        for event in frame.events:
+            if event.verb == "switch":
+                _, gpio, gpio_value = event.args
+                switches[gpio] = gpio_value
+            elif event.verb == "dmx":
+                dmx_command, channel, scene_or_value = event.args[:3]
+                key = ("cue", channel) if dmx_command == "cue" else channel
+                # Re-inserted, so that the ops are replayed in the order their target was last changed
+                # (targets can overlap, e.g. a fixture and its group)
+                previous_ops = dmx.pop(key, [])
+                if dmx_command == "cue":
+                    # The look of a cue includes the ones before it in the list, so only the cue reached is replayed
+                    try:
+                        cue_positions[channel] = cue_index(channel, cue_lists.get(channel, ()), cue_positions.get(channel), scene_or_value)
+                    except ValueError:
+                        # The cue fails when played too: the cue list stays where it was
+                        dmx[key] = previous_ops
+                        continue
+                    dmx[key] = [("cue_look", channel, cue_positions[channel])]
+                elif dmx_command in ["set", "fade"]:
+                    # A scene replaces whatever was set on the channel before
+                    dmx[key] = [("set", channel, scene_or_value)]
+                else:
+                    # Dimmer scales the current color, so it is replayed after the last scene
+                    dmx_ops = [op for op in previous_ops if op[0] == "set"]
+                    dmx[key] = dmx_ops + [("dimmer", channel, scene_or_value)]
+            elif event.verb == "audio":
+                if event.action == "playmusic":
+                    music = event.args[0]
+                elif event.action == "fadeout":
+                    music = None
+
+        dmx_ops = tuple(op for channel_ops in dmx.values() for op in channel_ops)
+        snapshots.append(SequenceSnapshot(frame.time, tuple(switches.items()), dmx_ops, music))
+    return tuple(snapshots)
+
+
+def seek_plan(plan, offset):
+    """
+    Find where playback resumes when a plan is started at offset seconds.
+
+    Returns (snapshot, frame_index): the snapshot of the outputs at offset (None if offset is
+    before the first frame) and the index of the first frame still to be played.
+    """
+    frame_index = bisect.bisect_right(plan.frame_times, offset)
+    snapshot = plan.snapshots[frame_index - 1] if frame_index > 0 else None
+    return snapshot, frame_index
+
+
+class SequenceCompiler:
+    """
+    Compiles .seq files into immutable SequencePlan timelines, checking syntax, timestamp order
+    and asset references in a single pass.
+
+    Results (plans and failures) are cached by content hash, and the hash of each file is cached
+    by (mtime, size), so an unchanged file is never read or parsed again.
+    """
+
+    def __init__(self, mygpio_handler, audio_handler, dmx_handler):
+        self.mygpio_handler = mygpio_handler
+        self.audio_handler = audio_handler
+        self.dmx_handler = dmx_handler
+        self._file_keys = {}  # file_path -> (mtime_ns, size, digest)
+        self._lines = {}  # digest -> tuple of SequenceLine
+        self._plans = {}  # digest -> SequencePlan
+        self._failures = {}  # digest -> SequenceFailure
+
+    def get_lines(self, file_path):
+        digest, content = self._file_digest(file_path)
+        lines = self._lines.get(digest)
+        if lines is None:
+            result = self._build(file_path, digest, content)
+            lines = self._lines.get(digest)
+            if lines is None:
+                raise self._error(file_path, result)
+        return lines
+
+    def get_plan(self, file_path):
+        digest, content = self._file_digest(file_path)
+        result = self._plans.get(digest) or self._failures.get(digest)
+        if result is None:
+            result = self._build(file_path, digest, content)
+        if isinstance(result, SequenceFailure):
+            raise self._error(file_path, result)
+        return result
+
+    def validate(self, file_path):
+        """
+        Validate a sequence file, reusing the cached result while both the file content
+        and the existence of the assets it references are unchanged.
+
+        Returns a (plan, checked) tuple, where checked is False if the cached result was reused.
+        """
+        digest, content = self._file_digest(file_path)
+        result = self._plans.get(digest) or self._failures.get(digest)
+        checked = False
+        if result is None or any(self.audio_handler.asset_index.exists(asset) != existed for asset, existed in result.assets):
+            self._plans.pop(digest, None)
+            self._failures.pop(digest, None)
+            result = self._build(file_path, digest, content)
+            checked = True
+        if isinstance(result, SequenceFailure):
+            raise self._error(file_path, result)
+        return result, checked
+
+    def forget(self, file_path):
+        """Drop the cached entries of a file (e.g. a temporary upload file)."""
+        file_key = self._file_keys.pop(file_path, None)
+        if file_key is not None:
+            self._prune(file_key[2])
+
+    def _error(self, file_path, failure):
+        if failure.kind == "timestamps":
+            return RuntimeError(f"Error validating timestamps in {file_path}: {failure.detail}")
+        return RuntimeError(f"Error reading sequence file {file_path} line {failure.line_num}: {failure.detail}")
+
+    def _file_digest(self, file_path):
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            self.forget(file_path)
+            raise FileNotFoundError(f"File not found: {file_path}")
+
+        file_key = self._file_keys.get(file_path)
+        if file_key is not None and file_key[0] == stat.st_mtime_ns and file_key[1] == stat.st_size:
+            return file_key[2], None
+
+        with open(file_path, "rb") as file:
+            content = file.read()
+        digest = hashlib.sha1(content).hexdigest()
+        self._file_keys[file_path] = (stat.st_mtime_ns, stat.st_size, digest)
+        if file_key is not None and file_key[2] != digest:
+            self._prune(file_key[2])
+        return digest, content
+
+    def _prune(self, digest):
+        # Keep cached results only while some file still has that content
+        if any(file_key[2] == digest for file_key in self._file_keys.values()):
+            return
+        self._lines.pop(digest, None)
+        self._plans.pop(digest, None)
+        self._failures.pop(digest, None)
+
+    def _build(self, file_path, digest, content):
+        if content is None:
+            # The digest was known but its results were dropped: read the file again
+            with open(file_path, "rb") as file:
+                content = file.read()
+
+        lines = self._lines.get(digest)
+        if lines is None:
+            lines = self._parse_lines(content)
+            if isinstance(lines, SequenceFailure):
+                self._failures[digest] = lines
+                return lines
+            self._lines[digest] = lines
+
+        result = self._compile(digest, lines)
+        if isinstance(result, SequenceFailure):
+            self._failures[digest] = result
+            logger.debug(f"Sequence {file_path} failed validation at line {result.line_num}")
+        else:
+            self._plans[digest] = result
+            logger.debug(f"Compiled sequence {file_path}: {len(result.events)} events, {result.duration}s")
+        return result
+
+    def _parse_lines(self, content):
+        lines = []
+        line_num = 0
+        try:
+            for line_num, line in enumerate(content.decode().splitlines(), start=1):
+                command_line = line.strip()
+
+                # Remove everything after #, treating it as a comment
+                command_line = command_line.split("#", 1)[0].strip()
+                command_line = command_line.split("//", 1)[0].strip()
+
+                if not command_line:
+                    # If the line is empty after removing the comment, skip it
+                    continue
+
+                time_mark, command_body = extract_time_mark(command_line)
+                lines.append(SequenceLine(line_num, time_mark, command_body))
+        except Exception as e:
+            return SequenceFailure("reading", line_num, str(e), ())
+        return tuple(lines)
+
+    def _compile(self, digest, lines):
+        events = []
+        assets = []
+        previous_line = None
+        for line in lines:
+            try:
+                time_mark_seconds = int(line.time_mark)
+                event = self.compile_command(time_mark_seconds, line.line_num, line.command_body, assets)
+            except Exception as e:
+                return SequenceFailure("reading", line.line_num, str(e), tuple(assets))
+
+            # Check that timestamps are in consecutive order
+            if previous_line is not None and time_mark_seconds < previous_line[0]:
+                detail = f"Line {line.line_num} has timestamp {time_mark_seconds}s which is less than line {previous_line[1]} timestamp {previous_line[0]}s"
+                return SequenceFailure("timestamps", line.line_num, detail, tuple(assets))
+            previous_line = (time_mark_seconds, line.line_num)
+
+            if event is not None:
+                events.append(event)
+
+        events = tuple(events)
+        duration = max((event.time for event in events), default=0)
+        frames = build_frames(events)
+        frame_times = tuple(frame.time for frame in frames)
+        cue_lists = {name: cues.cue_names for name, cues in self.dmx_handler.cue_lists.items()}
+        return SequencePlan(digest, lines, events, duration, tuple(assets), frames, frame_times, build_snapshots(frames, cue_lists))
+
+    def _check_asset(self, asset_path, assets):
+        exists = self.audio_handler.asset_index.exists(asset_path)
+        assets.append((asset_path, exists))
+        return exists
+
+    def compile_command(self, time_mark_seconds, line_num, command_body, assets):
+        parts = command_body.split()
+
+        verb = parts[0].lower()
+        # TODO: motor stop
+        if verb == "motor" and settings.motorEnabled:
+            if parts[1].lower() == "start":
+                motor_number = int(parts[2])
+                direction = parts[3].lower()
+                speed = int(parts[4])
+
+                # Validate motor number
+                if not isinstance(motor_number, int) or motor_number < 1:
+                    raise ValueError(f"Invalid motor number: {motor_number}")
+
+                # Validate direction
+                if direction not in ["ccw", "cw"]:
+                    raise ValueError(f"Invalid motor direction: {direction}")
+                # Validate speed
+                if not isinstance(speed, int) or speed < 1:
+                    raise ValueError(f"Invalid motor speed: {speed}")
+
+                return SequenceEvent(time_mark_seconds, line_num, verb, "start", (motor_number, direction, speed), command_body)
+            return None
+
+        # Verify switch command
+        if verb == "switch":
+            device_name = parts[1]
+            action = parts[2].lower()
+
+            # Validate device name
+            if device_name not in self.mygpio_handler.GPIOMap:
+                raise ValueError(f"Invalid device name: {device_name}")
+
+            # Validate action
+            if action not in ["on", "off"]:
+                raise ValueError(f"Invalid action: {action}. Action must be 'on' or 'off'.")
+
+            # Warning: on GPIO the action is inverted: on = 0, off = 1
+            gpio_value = 0 if action == "on" else 1
+            gpio = self.mygpio_handler.GPIOMap[device_name]
+            return SequenceEvent(time_mark_seconds, line_num, verb, action, (device_name, gpio, gpio_value), command_body)
+
+        elif verb == "audio" and len(parts) >= 2:
+            action = parts[1].lower()
+            parameter = parts[2].lower()
+
+            if action == "fadeout":
+                fadeout_secs = int(parameter)
+                if not isinstance(fadeout_secs, int) or fadeout_secs < 0:
+                    raise ValueError(f"Invalid fadeout seconds: {fadeout_secs}")
+                return SequenceEvent(time_mark_seconds, line_num, verb, action, (fadeout_secs,), command_body)
+
+            elif action == "playmusic":
+                music_folder = self.audio_handler.get_music_path(parameter)
+                if not self._check_asset(music_folder, assets):
+                    raise ValueError(f"Music folder {music_folder} does not exist")
+                self.audio_handler.index_music_folder(music_folder)
+                return SequenceEvent(time_mark_seconds, line_num, verb, action, (music_folder,), command_body)
+
+            elif action == "playsfx":
+                sfx_file = self.audio_handler.get_sfx_filepath(parameter)
+                if not self._check_asset(sfx_file, assets):
+                    raise ValueError(f"Sfx file {sfx_file} does not exist")
+                return SequenceEvent(time_mark_seconds, line_num, verb, action, (sfx_file,), command_body)
+
+            raise ValueError(f"Unknown audio action: {action}")
+
+        # TODO: revisit the command interpreter vs sequence parser. Refactor to avoid code duplication.
+        elif verb == "dmx":
+            parsed_dmx_command_args = self.dmx_handler.validate_dmx_command_args(parts[1:])
+            if isinstance(parsed_dmx_command_args, str):
+                raise ValueError(parsed_dmx_command_args)
+            _, dmx_command, channel, scene_or_value, duration, curve = parsed_dmx_command_args
+
+            if not settings.dmxEnabled:
+                logger.warning("DMX module is disabled")
+            elif not self.dmx_handler.is_connected():
+                logger.warning("DMX module is not connected")
+
+            return SequenceEvent(time_mark_seconds, line_num, verb, dmx_command, (dmx_command, channel, scene_or_value, duration, curve), command_body)
+
+        raise ValueError(f"Unknown command: {command_body}")
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Whole-show dry runs on a virtual clock.
+
+A simulated cycle plays the main sequence, the standby sequence and (optionally) a period of
+random actions against MockGPIO and mocked audio/DMX sinks. Waits only move the virtual clock,
+so a full show runs in milliseconds and, for a given seed, always produces the same event log.
+MockGPIO runs in simulator mode on the same clock: every relay write is in its timeline, and the
+cycle can be started by a simulated, bouncing press of the start button. The motors run on MockGPIO
+too, when gpio.conf maps their pins: their limit switch moves sleep on the virtual clock.
+
+Example usage:
+    python simulation.py          # print the event log of a cycle
+    python simulation.py 42 300   # seed 42, then 300 virtual seconds of standby random actions
+    python simulation.py 42 0 3   # start the cycle with a press of the start button that bounces 3 times
+"""
+import asyncio
+import random
+import sys
+import time
+
+from dunebugger_settings import settings
+from dunebugger_logging import logger
+from clock import VirtualClock
+from dunemock import MockAudioPlayer, MockDMXController
+from gpio_handler import GPIOHandler, GPIO
+from motor import MotorController
+from sequence import SequencesHandler
+from state_tracker import StateTracker
+
+
+def build_simulated_sequence_handler(seed=0):
+    if settings.ON_RASPBERRY_PI:
+        raise RuntimeError("Simulations run on MockGPIO and can't run on a Raspberry Pi")
+
+    clock = VirtualClock()
+    GPIO.simulate(clock, seed)
+    event_log = []
+    state_tracker = StateTracker()
+    gpio_handler = GPIOHandler(state_tracker, clock)
+    # The motors need their pins in gpio.conf (Motor<n>PWM, Motor<n>In1/In2, In_Motor<n>LimitCW/CCW)
+    try:
+        motor_handler = MotorController(gpio_handler, GPIO, clock)
+    except KeyError as e:
+        logger.debug(f"Motor pin {e} not in the GPIO configuration: motors are not simulated")
+        motor_handler = None
+    sequence_handler = SequencesHandler(
+        gpio_handler,
+        GPIO,
+        MockAudioPlayer(clock, event_log),
+        state_tracker,
+        motor_handler,
+        MockDMXController(clock, event_log),
+        clock=clock,
+        rng=random.Random(seed),
+    )
+    sequence_handler.event_log = event_log
+    return sequence_handler
+
+
+async def run_cycle_simulation(seed=0, standby_secs=0, start_offset=0, sequence_handler=None):
+    """Run one cycle followed by standby_secs of standby. Returns the list of (virtual_time, event)."""
+    if sequence_handler is None:
+        sequence_handler = build_simulated_sequence_handler(seed)
+    if not sequence_handler.sequences_validated:
+        raise RuntimeError("Cannot simulate cycle: sequence files are not properly validated")
+
+    sequence_handler.enable_random_actions()
+    await sequence_handler.cycle(start_offset)
+    sequence_handler.clock.advance(standby_secs)
+    sequence_handler.disable_random_actions()
+    return sequence_handler.event_log
+
+
+async def run_press_simulation(seed=0, standby_secs=0, bounces=0, sequence_handler=None):
+    """
+    Like run_cycle_simulation, but the cycle is started by a press of the start button on MockGPIO,
+    through the input debouncer and the start button policy.
+    """
+    if sequence_handler is None:
+        sequence_handler = build_simulated_sequence_handler(seed)
+    if not sequence_handler.sequences_validated:
+        raise RuntimeError("Cannot simulate cycle: sequence files are not properly validated")
+
+    gpio_handler = sequence_handler.mygpio_handler
+    await gpio_handler.start_input_events()
+    await sequence_handler.start_cycle_runner()
+    try:
+        sequence_handler.enable_random_actions()
+        sequence_handler.enable_start_button()
+        bounce_secs = 0.005
+        GPIO.press(gpio_handler.GPIOMap[settings.startButtonGPIOName], bounces=bounces, bounce_secs=bounce_secs)
+        # Let the press settle and be confirmed, then hand over to the cycle task: its waits move the clock
+        sequence_handler.clock.advance(settings.bouncingTreshold + 2 * bounces * bounce_secs)
+        while not sequence_handler.cycle_tasks and sequence_handler.trigger_stats["presses"] == 0:
+            await asyncio.sleep(0)
+        await asyncio.gather(*sequence_handler.cycle_tasks)
+        sequence_handler.clock.advance(standby_secs)
+        sequence_handler.disable_random_actions()
+        sequence_handler.disable_start_button()
+    finally:
+        await sequence_handler.stop_cycle_runner()
+        await gpio_handler.stop_input_events()
+    return sequence_handler.event_log
+
+
+async def run_motor_limits_simulation(motornum=1, travel_secs=5.0, seed=0, sequence_handler=None):
+    """
+    Run the limit switch reset of a motor: it runs CW until its CW limit switch is touched travel_secs
+    later, then backs off CCW. Returns the MockGPIO timeline of the run.
+    """
+    if sequence_handler is None:
+        sequence_handler = build_simulated_sequence_handler(seed)
+    motor_handler = sequence_handler.motor_handler
+    if motor_handler is None:
+        raise RuntimeError("Cannot simulate motor limits: the motor pins are not in the GPIO configuration")
+
+    gpio_handler = sequence_handler.mygpio_handler
+    clock = sequence_handler.clock
+    start = clock.monotonic()
+    await gpio_handler.start_input_events()
+    try:
+        reset_event = motor_handler.subscribe_limits()[motornum - 1]
+        motor_handler.reset(motornum)
+        GPIO.press(gpio_handler.GPIOMap[f"In_Motor{motornum}LimitCW"], delay=travel_secs, hold_secs=1.0)
+        clock.advance(travel_secs)
+        # Tick until the touch is confirmed and the limit switch callback ran: its sleeps move the clock
+        while not reset_event.is_set():
+            clock.advance(0.01)
+            await asyncio.sleep(0)
+    finally:
+        motor_handler.motor_clean()
+        await gpio_handler.stop_input_events()
+    return GPIO.get_timeline(since=start)
+
+
+if __name__ == "__main__":
+    seed = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    standby_secs = float(sys.argv[2]) if len(sys.argv) > 2 else 0
+    bounces = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    start = time.perf_counter()
+    if bounces is None:
+        event_log = asyncio.run(run_cycle_simulation(seed, standby_secs))
+    else:
+        event_log = asyncio.run(run_press_simulation(seed, standby_secs, bounces))
+    elapsed = time.perf_counter() - start
+
+    for virtual_time, event in event_log:
+        print(f"{virtual_time:10.3f} {event}")
+    gpio_writes = len(GPIO.get_timeline()) - len(GPIO.get_timeline(source="input"))
+    logger.info(
+        f"Simulated {event_log[-1][0] if event_log else 0:.1f}s of show ({len(event_log)} events, {gpio_writes} GPIO writes) in {elapsed * 1000:.1f}ms"
+    )
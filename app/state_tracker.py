@@ -1,4 +1,5 @@
 import asyncio
+import threading
 from dunebugger_settings import settings
 from dunebugger_logging import logger
 class StateTracker:
@@ -17,15 +18,27 @@ class StateTracker:
         self.mqueue_handler = None
         self.monitor_task = None
         self.running = True
-        self.check_interval = int(settings.mQueueStateCheckIntervalSecs)
+        self.min_publish_interval = settings.mQueueStateMinPublishIntervalSecs
+        # notify_update is called from any thread: the flags are guarded by a lock and the
+        # monitor task is woken on its loop with call_soon_threadsafe
+        self.lock = threading.Lock()
+        self.loop = None
+        self.wakeup_event = None
+        self.wakeup_pending = False
 
     def notify_update(self, attribute):
         if attribute in self.state_changes:
-            self.state_changes[attribute] = True
+            with self.lock:
+                self.state_changes[attribute] = True
+                if self.loop is None or self.wakeup_pending:
+                    return
+                self.wakeup_pending = True
+            self.loop.call_soon_threadsafe(self.wakeup_event.set)
 
     def clear_update(self, attribute):
         if attribute in self.state_changes:
-            self.state_changes[attribute] = False
+            with self.lock:
+                self.state_changes[attribute] = False
 
     def has_changes(self):
         return any(self.state_changes.values())
@@ -34,11 +47,25 @@ class StateTracker:
         return [key for key, value in self.state_changes.items() if value]
 
     def reset_changes(self):
-        for key in self.state_changes:
-            self.state_changes[key] = False
+        with self.lock:
+            for key in self.state_changes:
+                self.state_changes[key] = False
+
+    def take_changes(self):
+        """Return the changed states and reset them, atomically."""
+        with self.lock:
+            changed_states = self.get_changes()
+            for state in changed_states:
+                self.state_changes[state] = False
+            self.wakeup_pending = False
+            return changed_states
 
     async def start_state_monitoring(self):
         """Start the state monitoring task"""
+        self.loop = asyncio.get_running_loop()
+        self.wakeup_event = asyncio.Event()
+        # Changes notified before the loop was known are published right away
+        self.wakeup_event.set()
         self.monitor_task = asyncio.create_task(self._monitor_states())
 
     async def stop_state_monitoring(self):
@@ -56,27 +83,26 @@ class StateTracker:
         Monitor the state tracker for changes and react accordingly.
         """
         while self.running:
-            if self.has_changes():
-                changed_states = self.get_changes()
-                for state in changed_states:
-                    if state == "gpios":
-                        # React to GPIO state changes
-                        await self.mqueue_handler.send_gpio_state()
-                    elif state in ["random_actions", "cycle_start_stop", "start_button", "sequences_validated"]:
-                        # Handle random actions state change
-                        await self.mqueue_handler.send_sequence_state()
-                    elif state == "playing_time":
-                        # Handle playing time changes
-                        await self.mqueue_handler.send_playing_time()
-                    elif state == "sequence":
-                        # Handle sequence changes
-                        await self.mqueue_handler.send_sequence()
-                    elif state == "config":
-                        # Handle configuration changes
-                        logger.debug("Configuration changed. Reloading settings...")
-                # Reset the state tracker after handling changes
-                self.reset_changes()
-            await asyncio.sleep(self.check_interval)
-
+            await self.wakeup_event.wait()
+            self.wakeup_event.clear()
+            changed_states = self.take_changes()
+            if any(state in changed_states for state in ["random_actions", "cycle_start_stop", "start_button", "sequences_validated"]):
+                # Handle random actions state change (one message covers all of these states)
+                await self.mqueue_handler.send_sequence_state()
+            for state in changed_states:
+                if state == "gpios":
+                    # React to GPIO state changes
+                    await self.mqueue_handler.send_gpio_state()
+                elif state == "playing_time":
+                    # Handle playing time changes
+                    await self.mqueue_handler.send_playing_time()
+                elif state == "sequence":
+                    # Handle sequence changes
+                    await self.mqueue_handler.send_sequence()
+                elif state == "config":
+                    # Handle configuration changes
+                    logger.debug("Configuration changed. Reloading settings...")
+            # Changes notified during this interval are coalesced and published together on the next wakeup
+            await asyncio.sleep(self.min_publish_interval)
 
 state_tracker = StateTracker()
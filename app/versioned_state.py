@@ -0,0 +1,37 @@
+import uuid
+
+
+class VersionedState:
+    """
+    Last published values of the remote state, split in sections (e.g. "gpios", "sequence"),
+    with the revision each value last changed at.
+
+    A single revision counter is shared by all the sections, and is bumped once per update
+    that changes anything. A client that knows revision N can be sent only what changed after N.
+    The counter restarts with the process, so revisions are only comparable within an epoch,
+    a random id drawn at each start.
+    """
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex
+        self.revision = 0
+        self._sections = {}  # section -> {key: (revision, value)}
+
+    def update(self, section, values):
+        """Store values (a dict) and return the ones that changed, at the new revision."""
+        fields = self._sections.setdefault(section, {})
+        changes = {key: value for key, value in values.items() if key not in fields or fields[key][1] != value}
+        if changes:
+            self.revision += 1
+            for key, value in changes.items():
+                fields[key] = (self.revision, value)
+        return changes
+
+    def get(self, section):
+        return {key: value for key, (_, value) in self._sections.get(section, {}).items()}
+
+    def changes_since(self, section, revision, epoch):
+        """Values changed after revision of epoch, or None if revision is unknown (e.g. from before a restart)."""
+        if epoch != self.epoch or not isinstance(revision, int) or not 0 <= revision <= self.revision:
+            return None
+        return {key: value for key, (changed_at, value) in self._sections.get(section, {}).items() if changed_at > revision}